@@ -0,0 +1,195 @@
+# =====================
+# CONTROLS
+# =====================
+# Input layer shared by the games. FixedStep calls sample() once every
+# pyxel frame to latch key presses, and once per update the game calls
+# poll(), which snapshots the keys it cares about (and the mouse) from
+# pyxel plus the presses latched since the last poll, or takes the next
+# frame from a replay log instead. The game then reads
+# btn/btnp/mouse_x/mouse_y from the snapshot, so a replay sees exactly the
+# input the recording saw. The log also stores the seed the game's RNG was
+# built from, and together they reproduce a session frame for frame.
+#
+# Log format, little endian:
+#   header  "PXIN", version u8, flags u8 (1 = mouse), key count u8, seed u64
+#   keys    one u32 pyxel key code per key
+#   runs    repeat u16, held mask, pressed mask (ceil(keys / 8) bytes each),
+#           then mouse x, y as i16 when the mouse flag is set
+# A run covers `repeat` consecutive frames with identical input, so idle
+# stretches cost a few bytes.
+#
+#   python Pacman.py --record session.pxin
+#   python Pacman.py --replay session.pxin
+#   python Headless.py Pacman 100000 --replay session.pxin
+
+import atexit
+import random
+import struct
+
+import pyxel
+
+MAGIC = b"PXIN"
+VERSION = 1
+FLAG_MOUSE = 1
+HEADER = struct.Struct("<4sBBBQ")
+REPEAT = struct.Struct("<H")
+MOUSE = struct.Struct("<hh")
+MAX_REPEAT = 0xFFFF
+
+
+class Controls:
+    """Per-frame input snapshot: live from pyxel, recorded, or replayed"""
+
+    def __init__(self, keys, mouse=False, seed=None, record=None):
+        self.keys = tuple(keys)
+        self.bits = {key: 1 << i for i, key in enumerate(self.keys)}
+        self.mouse = mouse
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.mask_size = (len(self.keys) + 7) // 8
+        self.held = 0
+        self.pressed = 0
+        self.mouse_x = self.mouse_y = 0
+        self.frame = 0
+        self.latched = 0  # Presses sampled since the last live poll
+        self.finished = False
+
+        self.runs = None  # Replay: [(repeat, held, pressed, mx, my)]
+        self.run_index = 0
+        self.run_left = 0
+
+        self.log = None  # Recording: open file and the run being extended
+        self.state = None
+        self.repeat = 0
+        if record is not None:
+            self.log = open(record, "wb")
+            self.log.write(HEADER.pack(MAGIC, VERSION, FLAG_MOUSE if mouse else 0,
+                                       len(self.keys), self.seed))
+            self.log.write(struct.pack(f"<{len(self.keys)}I", *self.keys))
+            self.log.flush()
+            # The last run is only written by close(); games exit through
+            # pyxel.quit() or the window without calling it
+            atexit.register(self.close)
+
+    @classmethod
+    def load(cls, path):
+        """Controls that replay the log at `path`"""
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, flags, count, seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} input log")
+        offset = HEADER.size
+        keys = struct.unpack_from(f"<{count}I", data, offset)
+        offset += 4 * count
+
+        controls = cls(keys, flags & FLAG_MOUSE, seed)
+        size = controls.mask_size
+        runs = []
+        while offset < len(data):
+            repeat, = REPEAT.unpack_from(data, offset)
+            offset += REPEAT.size
+            held = int.from_bytes(data[offset:offset + size], "little")
+            pressed = int.from_bytes(data[offset + size:offset + 2 * size], "little")
+            offset += 2 * size
+            mx = my = 0
+            if controls.mouse:
+                mx, my = MOUSE.unpack_from(data, offset)
+                offset += MOUSE.size
+            runs.append((repeat, held, pressed, mx, my))
+        controls.runs = runs
+        return controls
+
+    @classmethod
+    def from_argv(cls, argv, keys, mouse=False):
+        """Controls for a game's command line: --replay FILE, or live input
+        with an optional --seed N and --record FILE"""
+        def option(name):
+            return argv[argv.index(name) + 1] if name in argv else None
+        if option("--replay"):
+            return cls.load(option("--replay"))
+        seed = option("--seed")
+        return cls(keys, mouse, None if seed is None else int(seed), option("--record"))
+
+    @property
+    def frames(self):
+        """Frames in the replay log"""
+        return sum(run[0] for run in self.runs) if self.runs is not None else None
+
+    def sample(self):
+        """Latch this pyxel frame's presses; call once per pyxel frame.
+
+        A pyxel frame can run no tick (FixedStep ahead of real time) or
+        several (catching up); latching hands each press to exactly one
+        poll() either way.
+        """
+        if self.runs is not None:
+            return
+        for key, bit in self.bits.items():
+            if pyxel.btnp(key):
+                self.latched |= bit
+
+    def poll(self):
+        """Take this frame's input; call once at the top of update()"""
+        self.frame += 1
+        if self.runs is not None:
+            self.next_replayed()
+            return
+
+        held = 0
+        for key, bit in self.bits.items():
+            if pyxel.btn(key):
+                held |= bit
+        self.held, self.pressed = held, self.latched
+        self.latched = 0
+        if self.mouse:
+            self.mouse_x, self.mouse_y = pyxel.mouse_x, pyxel.mouse_y
+        if self.log is not None:
+            self.record()
+
+    def next_replayed(self):
+        while not self.run_left:
+            if self.run_index == len(self.runs):
+                # Log exhausted: nothing held from here on
+                self.finished = True
+                self.held = self.pressed = 0
+                return
+            self.run_left, self.held, self.pressed, self.mouse_x, self.mouse_y = \
+                self.runs[self.run_index]
+            self.run_index += 1
+        self.run_left -= 1
+
+    def record(self):
+        state = (self.held, self.pressed, self.mouse_x, self.mouse_y)
+        if state == self.state and self.repeat < MAX_REPEAT:
+            self.repeat += 1
+            return
+        self.write_run()
+        self.state = state
+        self.repeat = 1
+
+    def write_run(self):
+        # Flushed per run, so a crash loses at most the run in progress
+        if not self.repeat:
+            return
+        held, pressed, mx, my = self.state
+        log = self.log
+        log.write(REPEAT.pack(self.repeat))
+        log.write(held.to_bytes(self.mask_size, "little"))
+        log.write(pressed.to_bytes(self.mask_size, "little"))
+        if self.mouse:
+            log.write(MOUSE.pack(mx, my))
+        log.flush()
+
+    def close(self):
+        """Write out the last run and stop recording"""
+        if self.log is None:
+            return
+        self.write_run()
+        self.log.close()
+        self.log = None
+
+    def btn(self, key):
+        return self.held & self.bits[key] != 0
+
+    def btnp(self, key):
+        return self.pressed & self.bits[key] != 0
@@ -1,5 +1,17 @@
 import pyxel
 import random
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from TimerWheel import TimerWheel
+from Controls import Controls
+from FixedStep import FixedStep
+from Profiler import Profiler
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only the EnemyStore needs it
+    np = None
 
 # ======================
 # CONFIG
@@ -8,6 +20,16 @@ TILE = 8
 MAP_W = 16
 MAP_H = 16
 
+# Streamed worlds (Game(world_size=...)), see World
+WORLD_SIZE = None   # e.g. 1024 for a 1024x1024 streamed world
+VIEW_W = 16         # Viewport in tiles
+VIEW_H = 16
+CHUNK = 16          # Chunk side in tiles
+CHUNK_RADIUS = 2    # Chunks kept loaded around the player's chunk
+CHUNK_CACHE = 64    # Loaded chunks kept before LRU eviction
+FLOW_WINDOW = 32    # Flow field side in tiles, centred on the player
+TILEMAP_SIZE = 256  # Tilemap side in tiles; streamed chunks wrap around it
+
 IMG_WORLD = 0  # Image bank for tiles
 IMG_PLAYER = 1  # Image bank for player
 IMG_ENEMY = 2   # Image bank for enemies
@@ -24,6 +46,24 @@ STATE_SWIPE = 3
 
 STATES_PER_DIR = 4
 
+# Keys read through Controls (recorded and replayed)
+INPUT_KEYS = (pyxel.KEY_UP, pyxel.KEY_DOWN, pyxel.KEY_LEFT, pyxel.KEY_RIGHT, pyxel.KEY_SPACE, pyxel.KEY_Z)
+# Game methods timed by the profiler (python Dungeon.py --profile)
+PROFILE_PHASES = (
+    "update_player", "stream_chunks", "check_pellets", "check_portal",
+    "update_enemies", "wake_enemy", "resolve_moves", "check_enemy_collisions",
+    "draw_fog", "draw_enemy", "draw_player",
+)
+
+# Tile step for each direction, indexed by DIR_*
+DIR_DELTA = ((0, 1), (-1, 0), (1, 0), (0, -1))
+OPPOSITE_DIR = (DIR_UP, DIR_RIGHT, DIR_LEFT, DIR_DOWN)
+# The other three directions, sideways ones first
+DIR_OTHERS = tuple(
+    tuple(sorted((d for d in range(4) if d != direction), key=lambda d: d == OPPOSITE_DIR[direction]))
+    for direction in range(4)
+)
+
 # ======================
 # MAP MATH - Sprite positions in Image0
 # ======================
@@ -35,6 +75,14 @@ SPRITE_WALL = 1
 SPRITE_WALL2 = 2
 SPRITE_PELLET = 3
 
+# Wall autotiling: bitmask of neighbouring walls -> sprite row
+WALL_N = 1
+WALL_W = 2
+WALL_E = 4
+WALL_S = 8
+# Walls with open floor below show their front face (SPRITE_WALL2)
+AUTOTILE = tuple(SPRITE_WALL if mask & WALL_S else SPRITE_WALL2 for mask in range(16))
+
 PORTAL_FRAMES = 4
 SPRITE_PORTAL_FRONT = 4
 SPRITE_PORTAL_LEFT = 5
@@ -49,6 +97,8 @@ COLOR_WALL2 = 13     # Darker stone wall
 COLOR_BORDER = 8     # Dark blue border
 COLOR_PELLET = 10    # Yellow pellet
 COLOR_PORTAL = 9     # Magenta portal
+COLOR_FOG = 0        # Fog of war
+COLOR_FOG_CLEAR = 11 # Transparent key of the fog layer
 
 # ======================
 # ENEMY SPRITE MATH (Image Bank 2)
@@ -83,6 +133,301 @@ ENEMY_ROW_RIGHT_ATTACK = 12
 ENEMY_ROW_RIGHT_SWIPE = 13
 
 
+# ======================
+# OCCUPANCY GRID
+# ======================
+CELL_WALL = 1
+CELL_PELLET = 2
+CELL_PORTAL = 4
+CELL_ENEMY = 8
+
+
+class Grid:
+    """Per-tile occupancy flags in a flat bytearray (index = y * width + x).
+
+    Enemies are also bucketed per tile so collision and attack checks only
+    look at the handful of tiles around the player.
+    """
+    def __init__(self, width=MAP_W, height=MAP_H):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+        self.occupants = [None] * (width * height)
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_wall(self, x, y):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return True
+        return self.cells[y * self.width + x] & CELL_WALL != 0
+
+    def has(self, x, y, flag):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return False
+        return self.cells[y * self.width + x] & flag != 0
+
+    def cell(self, x, y):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return CELL_WALL
+        return self.cells[y * self.width + x]
+
+    def window(self, ox, oy, w, h):
+        """Cell flags of a w x h rectangle as one flat bytearray"""
+        if (ox, oy, w, h) == (0, 0, self.width, self.height):
+            return self.cells
+        cells = self.cells
+        rows = bytearray()
+        for y in range(oy, oy + h):
+            start = y * self.width + ox
+            rows += cells[start:start + w]
+        return rows
+
+    def set_flag(self, x, y, flag):
+        self.cells[y * self.width + x] |= flag
+
+    def clear_flag(self, x, y, flag):
+        self.cells[y * self.width + x] &= ~flag & 0xFF
+
+    def enemies_at(self, x, y):
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return ()
+        return self.occupants[y * self.width + x] or ()
+
+    def add_enemy(self, enemy):
+        self.add_at(enemy, enemy.y * self.width + enemy.x)
+
+    def remove_enemy(self, enemy):
+        self.remove_at(enemy, enemy.y * self.width + enemy.x)
+
+    def move_enemy(self, enemy, x, y):
+        self.remove_enemy(enemy)
+        enemy.x = x
+        enemy.y = y
+        self.add_enemy(enemy)
+
+    def add_at(self, enemy, i):
+        if self.occupants[i] is None:
+            self.occupants[i] = []
+        self.occupants[i].append(enemy)
+        self.cells[i] |= CELL_ENEMY
+
+    def remove_at(self, enemy, i):
+        bucket = self.occupants[i]
+        bucket.remove(enemy)
+        if not bucket:
+            self.occupants[i] = None
+            self.cells[i] &= ~CELL_ENEMY & 0xFF
+
+
+class Chunk(Grid):
+    """CHUNK x CHUNK tiles of a streamed world"""
+    def __init__(self, cx, cy):
+        super().__init__(CHUNK, CHUNK)
+        self.cx = cx
+        self.cy = cy
+        self.tiles = bytearray()
+
+
+class ChunkGrid:
+    """Grid API over the loaded chunks of a streamed world.
+
+    Chunks live in an OrderedDict used as an LRU; tiles in chunks that
+    aren't loaded read as walls.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.chunks = OrderedDict()
+
+    def locate(self, x, y):
+        """Chunk holding tile (x, y) (None if not loaded) and its index there"""
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return None, 0
+        chunk = self.chunks.get((x // CHUNK, y // CHUNK))
+        return chunk, (y % CHUNK) * CHUNK + x % CHUNK
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_wall(self, x, y):
+        chunk, i = self.locate(x, y)
+        return chunk is None or chunk.cells[i] & CELL_WALL != 0
+
+    def has(self, x, y, flag):
+        chunk, i = self.locate(x, y)
+        return chunk is not None and chunk.cells[i] & flag != 0
+
+    def cell(self, x, y):
+        chunk, i = self.locate(x, y)
+        return CELL_WALL if chunk is None else chunk.cells[i]
+
+    def set_flag(self, x, y, flag):
+        chunk, i = self.locate(x, y)
+        chunk.cells[i] |= flag
+
+    def clear_flag(self, x, y, flag):
+        chunk, i = self.locate(x, y)
+        chunk.cells[i] &= ~flag & 0xFF
+
+    def window(self, ox, oy, w, h):
+        """Cell flags of a w x h rectangle, walls where nothing is loaded"""
+        rows = bytearray([CELL_WALL]) * (w * h)
+        for y in range(oy, oy + h):
+            x = ox
+            while x < ox + w:
+                run = min(CHUNK - x % CHUNK, ox + w - x)
+                chunk, i = self.locate(x, y)
+                if chunk is not None:
+                    start = (y - oy) * w + (x - ox)
+                    rows[start:start + run] = chunk.cells[i:i + run]
+                x += run
+        return rows
+
+    def enemies_at(self, x, y):
+        chunk, i = self.locate(x, y)
+        if chunk is None:
+            return ()
+        return chunk.occupants[i] or ()
+
+    def add_enemy(self, enemy):
+        chunk, i = self.locate(enemy.x, enemy.y)
+        chunk.add_at(enemy, i)
+
+    def remove_enemy(self, enemy):
+        chunk, i = self.locate(enemy.x, enemy.y)
+        chunk.remove_at(enemy, i)
+
+    def move_enemy(self, enemy, x, y):
+        self.remove_enemy(enemy)
+        enemy.x = x
+        enemy.y = y
+        self.add_enemy(enemy)
+
+
+# ======================
+# PATHING
+# ======================
+FLOW_UNREACHED = -1
+FLOW_NO_STEP = 255
+MOVE_PENDING = 0  # Enemy.update: step queued for Game.resolve_moves
+
+
+class FlowField:
+    """Shared BFS distance field from the player's tile.
+
+    Rebuilt only when the player changes tile (or the walls change), so every
+    enemy reads its next step in O(1) no matter how many enemies there are.
+    The field covers a width x height window centred on the player (the whole
+    map for fixed levels); enemies outside it fall back to a direct chase.
+    """
+    def __init__(self, width=MAP_W, height=MAP_H):
+        self.width = width
+        self.height = height
+        self.ox = self.oy = 0  # Window origin in map tiles
+        self.dist = [FLOW_UNREACHED] * (width * height)
+        self.step = bytearray([FLOW_NO_STEP]) * (width * height)
+        self.origin = None
+
+    def invalidate(self):
+        """Force a rebuild on the next update (walls changed)"""
+        self.origin = None
+
+    def update(self, px, py, grid):
+        if self.origin == (px, py):
+            return
+        self.origin = (px, py)
+
+        w, h = self.width, self.height
+        ox = min(max(px - w // 2, 0), grid.width - w)
+        oy = min(max(py - h // 2, 0), grid.height - h)
+        self.ox, self.oy = ox, oy
+        size = w * h
+        cells = grid.window(ox, oy, w, h)
+        dist = [FLOW_UNREACHED] * size
+        step = bytearray([FLOW_NO_STEP]) * size
+        start = (py - oy) * w + (px - ox)
+        dist[start] = 0
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            x, y = i % w, i // w
+            d = dist[i] + 1
+            for direction, (dx, dy) in enumerate(DIR_DELTA):
+                nx, ny = x + dx, y + dy
+                if nx < 0 or ny < 0 or nx >= w or ny >= h:
+                    continue
+                n = ny * w + nx
+                if dist[n] != FLOW_UNREACHED or cells[n] & CELL_WALL:
+                    continue
+                dist[n] = d
+                # Neighbour steps back the way we came: opposite of `direction`
+                step[n] = OPPOSITE_DIR[direction]
+                queue.append(n)
+        self.dist = dist
+        self.step = step
+
+    def direction_at(self, x, y):
+        """Direction that moves one tile closer to the player, or None"""
+        x -= self.ox
+        y -= self.oy
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return None
+        d = self.step[y * self.width + x]
+        return None if d == FLOW_NO_STEP else d
+
+    def distance_at(self, x, y):
+        x -= self.ox
+        y -= self.oy
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return FLOW_UNREACHED
+        return self.dist[y * self.width + x]
+
+
+class Reservations:
+    """Per-tick reservation table for the enemies stepping this frame.
+
+    `tiles` maps each tile claimed this tick to the enemy moving into it and
+    `edges` holds the (from, to) steps taken, so two enemies can never walk
+    through each other; enemies standing still block their tile through the
+    grid. Every check is a dict/set lookup, so a tick costs O(movers).
+    """
+    def __init__(self):
+        self.tiles = {}
+        self.edges = set()
+
+    def clear(self):
+        self.tiles.clear()
+        self.edges.clear()
+
+    def claim(self, enemy, x, y, direction, grid, flow=None):
+        """Claim a step from (x, y) for `enemy`, preferring `direction`.
+
+        If that tile is taken, any other neighbour closer to the player on
+        the flow field will do, so a pack fans out over every shortest path
+        (and flanks) instead of queueing on one. Returns the direction
+        claimed, or None when the enemy has to wait.
+        """
+        here = flow.distance_at(x, y) if flow else FLOW_UNREACHED
+        for d in (direction,) + DIR_OTHERS[direction]:
+            nx, ny = x + DIR_DELTA[d][0], y + DIR_DELTA[d][1]
+            if d != direction:
+                there = flow.distance_at(nx, ny) if here > 0 else FLOW_UNREACHED
+                if there == FLOW_UNREACHED or there >= here:
+                    continue
+            if grid.cell(nx, ny) & (CELL_WALL | CELL_ENEMY):
+                continue
+            if (nx, ny) in self.tiles or ((nx, ny), (x, y)) in self.edges:
+                continue
+            self.tiles[(nx, ny)] = enemy
+            self.edges.add(((x, y), (nx, ny)))
+            return d
+        return None
+
+
 class Enemy:
     def __init__(self, x, y):
         self.x = x
@@ -94,14 +439,16 @@ class Enemy:
         self.speed = 1
         self.hp = 3
         self.alive = True
-        self.move_timer = 0
+        # Timers are frame numbers, so a sleeping enemy needs no per-frame work
+        self.move_at = 0
         self.move_delay = 30  # frames between moves
-        self.attack_cooldown = 0
+        self.cooldown_until = 0
         self.attacking = False  # Currently performing swipe attack
-        self.attack_timer = 0
+        self.attack_until = 0
         self.attack_duration = 15  # frames swipe lasts
-        self.damage_cooldown = 0  # 1000ms = 60 frames (at 60fps)
-        self.damage_cooldown_time = 60
+        self.damage_ready_at = 0
+        self.damage_cooldown_time = 60  # 1000ms = 60 frames (at 60fps)
+        self.timer = None  # Pending wake-up in the Game's TimerWheel
         
     def get_enemy_row(self):
         """Math: Get sprite row based on direction and state"""
@@ -135,72 +482,93 @@ class Enemy:
             return (self.x, self.y + 1)
         return (self.x, self.y)
     
-    def update(self, player_x, player_y, walls, enemies):
+    def start(self, now):
+        """Count the first move from frame `now` (level start)"""
+        self.move_at = now + self.move_delay
+    
+    def update(self, player_x, player_y, grid, moves, flow=None, now=0):
+        """Run whatever is due on frame `now`.
+
+        Returns the number of frames until the enemy next needs an update,
+        or None once it is dead. An enemy that wants to step is appended to
+        `moves` and returns MOVE_PENDING; it's stepped by Game.resolve_moves.
+        """
         if not self.alive:
-            return
-        
-        # Update damage cooldown
-        if self.damage_cooldown > 0:
-            self.damage_cooldown -= 1
+            return None
         
         # Handle attack animation timer
         if self.attacking:
-            self.attack_timer -= 1
-            if self.attack_timer <= 0:
-                self.attacking = False
-                self.state = STATE_IDLE
-            return
+            if now < self.attack_until:
+                return self.attack_until - now
+            self.attacking = False
+            self.state = STATE_IDLE
+            self.move_at = now + self.move_delay
+            return self.next_wake(now)
         
         # Move towards player
-        self.move_timer += 1
-        if self.attack_cooldown > 0:
-            self.attack_cooldown -= 1
+        if now < self.cooldown_until:
             self.state = STATE_IDLE
-        elif self.move_timer >= self.move_delay:
-            self.move_timer = 0
-            
-            # Calculate direction to player
-            if player_x < self.x:
-                self.dir = DIR_LEFT
-            elif player_x > self.x:
-                self.dir = DIR_RIGHT
-            elif player_y < self.y:
-                self.dir = DIR_UP
-            elif player_y > self.y:
-                self.dir = DIR_DOWN
-            
-            # Check if player is 1 tile away - ATTACK!
-            dist = abs(player_x - self.x) + abs(player_y - self.y)
-            if dist == 1:
-                # Player is in attack range - SWIPE!
-                self.state = STATE_SWIPE
-                self.attacking = True
-                self.attack_timer = self.attack_duration
-                return
-            
-            # Try to move
-            dx = dy = 0
-            if self.dir == DIR_LEFT:
-                dx = -1
-            elif self.dir == DIR_RIGHT:
-                dx = 1
-            elif self.dir == DIR_UP:
-                dy = -1
-            elif self.dir == DIR_DOWN:
-                dy = 1
-            
-            # Check collision
-            new_x = self.x + dx
-            new_y = self.y + dy
-            
-            if not self.is_wall(new_x, new_y, walls):
-                self.x = new_x
-                self.y = new_y
-                self.state = STATE_WALK
-            else:
-                self.state = STATE_IDLE
+        elif now >= self.move_at:
+            self.move_at = now + self.move_delay
+            if self.choose_move(player_x, player_y, grid, flow, now):
+                moves.append(self)
+                return MOVE_PENDING
+            if self.attacking:
+                return self.attack_duration
         
-        # Smooth screen movement
+        self.slide()
+        return self.next_wake(now)
+    
+    def next_wake(self, now):
+        """Frames until the next swipe end, slide step or move"""
+        if self.attacking:
+            return max(1, self.attack_until - now)
+        if self.screen_x != self.x * TILE or self.screen_y != self.y * TILE:
+            return 1
+        return max(1, max(self.move_at, self.cooldown_until) - now)
+    
+    def choose_move(self, player_x, player_y, grid, flow=None, now=0):
+        """Turn towards the player, then swipe if adjacent.
+
+        Returns True when the enemy wants to step forward instead.
+        """
+        # Follow the shared flow field; fall back to straight-line chase
+        # when the player can't be reached from this tile
+        step = flow.direction_at(self.x, self.y) if flow else None
+        if step is not None:
+            self.dir = step
+        elif player_x < self.x:
+            self.dir = DIR_LEFT
+        elif player_x > self.x:
+            self.dir = DIR_RIGHT
+        elif player_y < self.y:
+            self.dir = DIR_UP
+        elif player_y > self.y:
+            self.dir = DIR_DOWN
+        
+        # Check if player is 1 tile away - ATTACK!
+        dist = abs(player_x - self.x) + abs(player_y - self.y)
+        if dist == 1:
+            # Player is in attack range - SWIPE!
+            self.state = STATE_SWIPE
+            self.attacking = True
+            self.attack_until = now + self.attack_duration
+            return False
+        return True
+    
+    def step(self, grid, reservations, flow=None):
+        """Step forward, or around whatever claimed the tile ahead"""
+        direction = reservations.claim(self, self.x, self.y, self.dir, grid, flow)
+        if direction is None:
+            self.state = STATE_IDLE
+            return
+        self.dir = direction
+        dx, dy = DIR_DELTA[direction]
+        grid.move_enemy(self, self.x + dx, self.y + dy)
+        self.state = STATE_WALK
+    
+    def slide(self):
+        """Smooth screen movement towards the current tile"""
         target_x = self.x * TILE
         target_y = self.y * TILE
         if self.screen_x < target_x:
@@ -212,115 +580,930 @@ class Enemy:
         elif self.screen_y > target_y:
             self.screen_y = max(self.screen_y - self.speed, target_y)
     
-    def is_wall(self, x, y, walls):
-        if x < 0 or y < 0 or x >= MAP_W or y >= MAP_H:
-            return True
-        return (x, y) in walls
+    def is_wall(self, x, y, grid):
+        return grid.is_wall(x, y)
     
     def player_in_attack_range(self, px, py):
         """Check if player is in the swipe attack zone"""
         ax, ay = self.get_attack_pos()
         return px == ax and py == ay
     
-    def can_damage_player(self):
+    def can_damage_player(self, now):
         """Check if enemy can damage player (1000ms cooldown)"""
-        return self.damage_cooldown <= 0
+        return now >= self.damage_ready_at
     
-    def reset_damage_cooldown(self):
+    def reset_damage_cooldown(self, now):
         """Reset damage cooldown after dealing damage"""
-        self.damage_cooldown = self.damage_cooldown_time
+        self.damage_ready_at = now + self.damage_cooldown_time
 
 
-class Game:
-    def __init__(self):
-        pyxel.init(MAP_W * TILE, MAP_H * TILE, title="Dungeon Crawler")
-        pyxel.load("Dungeon.pyxres")
+# ======================
+# ENEMY STORE (NumPy)
+# ======================
+class StoreField:
+    """Enemy attribute backed by one column of an EnemyStore"""
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, view, owner=None):
+        if view is None:
+            return self
+        return getattr(view.store, self.name)[view.slot].item()
+
+    def __set__(self, view, value):
+        getattr(view.store, self.name)[view.slot] = value
+
+
+class EnemyStore:
+    """Structure-of-arrays enemy storage stepped with NumPy.
+
+    Due timers and smooth screen movement are checked for every enemy in a
+    few vectorized steps; only enemies that moved touch Python objects.
+    """
+    FIELDS = {
+        "x": "int32", "y": "int32",
+        "screen_x": "int32", "screen_y": "int32",
+        "dir": "int8", "state": "int8",
+        "speed": "int32", "hp": "int32", "alive": "bool",
+        "move_at": "int32", "move_delay": "int32",
+        "cooldown_until": "int32",
+        "attacking": "bool", "attack_until": "int32", "attack_duration": "int32",
+        "damage_ready_at": "int32", "damage_cooldown_time": "int32",
+    }
+
+    def __init__(self, capacity=256):
+        self.count = 0
+        self.capacity = capacity
+        self.views = []
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def add(self, x, y):
+        if self.count == self.capacity:
+            self.grow()
+        view = EnemyView(self, self.count, x, y)
+        self.views.append(view)
+        self.count += 1
+        return view
+
+    def grow(self):
+        self.capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def start(self, now):
+        """Vectorized Enemy.start"""
+        n = self.count
+        self.move_at[:n] = now + self.move_delay[:n]
+
+    def update(self, player_x, player_y, grid, reservations, flow=None, now=0):
+        """Vectorized Enemy.update for every enemy in the store"""
+        n = self.count
+        alive = self.alive[:n]
+        state = self.state[:n]
+        move_at = self.move_at[:n]
+        move_delay = self.move_delay[:n]
         
-        self.level = 1
-        self.score = 0
+        # Handle attack animation timer
+        was_attacking = self.attacking[:n] & alive
+        done = was_attacking & (self.attack_until[:n] <= now)
+        self.attacking[:n][done] = False
+        state[done] = STATE_IDLE
+        move_at[done] = now + move_delay[done]
         
-        # Generate first level
-        self.generate_level()
+        # Move towards player
+        free = alive & ~was_attacking
+        cooling = free & (self.cooldown_until[:n] > now)
+        state[cooling] = STATE_IDLE
+        due = free & ~cooling & (move_at <= now)
+        move_at[due] = now + move_delay[due]
+        slots = np.flatnonzero(due)
+        if slots.size:
+            self.choose_moves(slots, player_x, player_y, grid, reservations, flow, now)
         
-        pyxel.run(self.update, self.draw)
-    
-    def generate_level(self):
+        # Smooth screen movement (enemies that started a swipe stay put)
+        sliding = free & ~self.attacking[:n]
+        speed = self.speed[:n]
+        for screen, tile in ((self.screen_x[:n], self.x[:n]), (self.screen_y[:n], self.y[:n])):
+            step = np.clip(tile * TILE - screen, -speed, speed)
+            screen += step * sliding
+
+    def choose_moves(self, slots, player_x, player_y, grid, reservations, flow=None, now=0):
+        """Vectorized Enemy.choose_move for the enemies in `slots`"""
+        x = self.x[slots]
+        y = self.y[slots]
+        w = grid.width
+        
+        # Follow the shared flow field; straight-line chase where unreachable
+        dirs = self.dir[slots]
+        chase = np.select(
+            [player_x < x, player_x > x, player_y < y, player_y > y],
+            [DIR_LEFT, DIR_RIGHT, DIR_UP, DIR_DOWN],
+            dirs,
+        )
+        if flow is not None:
+            fx = x - flow.ox
+            fy = y - flow.oy
+            covered = (fx >= 0) & (fy >= 0) & (fx < flow.width) & (fy < flow.height)
+            step = np.full(len(slots), FLOW_NO_STEP, dtype=np.uint8)
+            field = np.frombuffer(flow.step, dtype=np.uint8)
+            step[covered] = field[(fy * flow.width + fx)[covered]]
+            dirs = np.where(step != FLOW_NO_STEP, step, chase).astype(np.int8)
+        else:
+            dirs = chase.astype(np.int8)
+        self.dir[slots] = dirs
+        
+        # Player 1 tile away - SWIPE!
+        swipe = np.abs(player_x - x) + np.abs(player_y - y) == 1
+        swiping = slots[swipe]
+        self.state[swiping] = STATE_SWIPE
+        self.attacking[swiping] = True
+        self.attack_until[swiping] = now + self.attack_duration[swiping]
+        
+        # Everyone else tries to step forward; the tile check is vectorized,
+        # claiming the step goes through the reservation table one by one
+        walk = ~swipe
+        delta = np.array(DIR_DELTA)[dirs]
+        nx = x + delta[:, 0]
+        ny = y + delta[:, 1]
+        inside = (nx >= 0) & (ny >= 0) & (nx < w) & (ny < grid.height)
+        cells = np.frombuffer(grid.cells, dtype=np.uint8)
+        open_ = np.zeros(len(slots), dtype=bool)
+        open_[inside] = cells[(ny * w + nx)[inside]] & CELL_WALL == 0
+        self.state[slots[walk & ~open_]] = STATE_IDLE
+        
+        # Closest to the player first, so the front of a pack moves out of
+        # the way of the enemies behind it
+        wants = np.flatnonzero(walk & open_)
+        if flow is not None:
+            fx = x[wants] - flow.ox
+            fy = y[wants] - flow.oy
+            covered = (fx >= 0) & (fy >= 0) & (fx < flow.width) & (fy < flow.height)
+            dist = np.full(len(wants), FLOW_UNREACHED)
+            dist[covered] = np.asarray(flow.dist)[(fy * flow.width + fx)[covered]]
+            # Unreached tiles (-1) go last; ties go top to bottom, left to right
+            dist[dist < 0] = np.iinfo(dist.dtype).max
+            wants = wants[np.lexsort((x[wants], y[wants], dist))]
+        views = self.views
+        for i in wants.tolist():
+            slot = int(slots[i])
+            ex, ey = int(x[i]), int(y[i])
+            direction = reservations.claim(views[slot], ex, ey, int(dirs[i]), grid, flow)
+            if direction is None:
+                self.state[slot] = STATE_IDLE
+                continue
+            dx, dy = DIR_DELTA[direction]
+            grid.remove_at(views[slot], ey * w + ex)
+            grid.add_at(views[slot], (ey + dy) * w + ex + dx)
+            self.x[slot] = ex + dx
+            self.y[slot] = ey + dy
+            self.dir[slot] = direction
+            self.state[slot] = STATE_WALK
+
+
+class EnemyView(Enemy):
+    """Enemy API over one slot of an EnemyStore"""
+    x = StoreField("x")
+    y = StoreField("y")
+    screen_x = StoreField("screen_x")
+    screen_y = StoreField("screen_y")
+    dir = StoreField("dir")
+    state = StoreField("state")
+    speed = StoreField("speed")
+    hp = StoreField("hp")
+    alive = StoreField("alive")
+    move_at = StoreField("move_at")
+    move_delay = StoreField("move_delay")
+    cooldown_until = StoreField("cooldown_until")
+    attacking = StoreField("attacking")
+    attack_until = StoreField("attack_until")
+    attack_duration = StoreField("attack_duration")
+    damage_ready_at = StoreField("damage_ready_at")
+    damage_cooldown_time = StoreField("damage_cooldown_time")
+
+    def __init__(self, store, slot, x, y):
+        self.store = store
+        self.slot = slot
+        super().__init__(x, y)
+
+
+# ======================
+# FIELD OF VIEW
+# ======================
+FOV_RADIUS = 6
+FOV_CACHE = 128  # Cached (tile, radius) results kept per level
+
+# Math: (xx, xy, yx, yy) maps octant-local (col, row) to map offsets
+FOV_OCTANTS = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+
+class FieldOfView:
+    """Recursive shadowcasting from the player's tile, plus explored memory.
+
+    Only recomputed when the player changes tile or the walls change; the
+    visible set for each (tile, radius) is cached, so walking back and forth
+    or standing still costs a dict lookup.
+    """
+    def __init__(self, radius=FOV_RADIUS):
+        self.radius = radius
+        self.cache = OrderedDict()
+        self.reset()
+
+    def reset(self):
+        """Forget everything (new level)"""
+        self.cache.clear()
+        self.origin = None
+        self.visible = frozenset()
+        self.explored = set()
+
+    def invalidate(self):
+        """Walls changed: drop cached results, keep the explored memory"""
+        self.cache.clear()
+        self.origin = None
+
+    def forget(self, x0, y0, w, h):
+        """Drop the explored memory of a block of tiles (an evicted chunk)"""
+        explored = self.explored
+        for y in range(y0, y0 + h):
+            for x in range(x0, x0 + w):
+                explored.discard((x, y))
+
+    def update(self, px, py, grid):
+        if self.origin == (px, py):
+            return
+        self.origin = (px, py)
+
+        key = (px, py, self.radius)
+        visible = self.cache.get(key)
+        if visible is None:
+            visible = self.compute(px, py, grid)
+            self.cache[key] = visible
+            if len(self.cache) > FOV_CACHE:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        self.visible = visible
+        self.explored |= visible
+
+    def compute(self, px, py, grid):
+        seen = {(px, py)}
+        for octant in FOV_OCTANTS:
+            self.cast(grid, px, py, 1, 1.0, 0.0, octant, seen)
+        return frozenset(seen)
+
+    def cast(self, grid, px, py, row, start, end, octant, seen):
+        """Math: scan one octant row by row between slopes start and end,
+        recursing past each wall run with the narrowed slope range"""
+        if start < end:
+            return
+        xx, xy, yx, yy = octant
+        radius = self.radius
+        radius_sq = radius * radius
+        new_start = start
+        for j in range(row, radius + 1):
+            blocked = False
+            dy = -j
+            for dx in range(-j, 1):
+                left = (dx - 0.5) / (dy + 0.5)
+                right = (dx + 0.5) / (dy - 0.5)
+                if start < right:
+                    continue
+                if end > left:
+                    break
+                x = px + dx * xx + dy * xy
+                y = py + dx * yx + dy * yy
+                if dx * dx + dy * dy <= radius_sq:
+                    seen.add((x, y))
+                wall = grid.is_wall(x, y)
+                if blocked:
+                    if wall:
+                        new_start = right
+                        continue
+                    blocked = False
+                    start = new_start
+                elif wall and j < radius:
+                    blocked = True
+                    self.cast(grid, px, py, j + 1, start, left, octant, seen)
+                    new_start = right
+            if blocked:
+                break
+
+
+# ======================
+# LEVEL GENERATION
+# ======================
+SPAWN_SPACING = 2  # Pellets and enemies keep at least this Manhattan distance
+LEVEL_ATTEMPTS = 20  # Wall layouts tried before giving up on a level
+SPAWN_ROOM = 2  # Enemies and pellets fill at most 1/SPAWN_ROOM of the free floor
+
+# Tile offsets closer than SPAWN_SPACING to a spawned object
+SPACING_OFFSETS = tuple(
+    (dx, dy)
+    for dx in range(-SPAWN_SPACING + 1, SPAWN_SPACING)
+    for dy in range(-SPAWN_SPACING + 1, SPAWN_SPACING)
+    if abs(dx) + abs(dy) < SPAWN_SPACING
+)
+
+
+class PlacementError(Exception):
+    """No free tile satisfies the spawn constraints"""
+
+
+def autotile(grid):
+    """Math: sprite row for every tile, walls picked by neighbour bitmask"""
+    tiles = bytearray(len(grid.cells))
+    for y in range(grid.height):
+        for x in range(grid.width):
+            if not grid.is_wall(x, y):
+                tiles[grid.index(x, y)] = SPRITE_FLOOR
+                continue
+            mask = 0
+            if grid.is_wall(x, y - 1):
+                mask |= WALL_N
+            if grid.is_wall(x - 1, y):
+                mask |= WALL_W
+            if grid.is_wall(x + 1, y):
+                mask |= WALL_E
+            if grid.is_wall(x, y + 1):
+                mask |= WALL_S
+            tiles[grid.index(x, y)] = AUTOTILE[mask]
+    return tiles
+
+
+def block_spacing(grid, blocked, x, y):
+    """Mark tiles closer than SPAWN_SPACING to (x, y)"""
+    for dx, dy in SPACING_OFFSETS:
+        if grid.in_bounds(x + dx, y + dy):
+            blocked[grid.index(x + dx, y + dy)] = 1
+
+
+def take_spots(grid, candidates, blocked, count, near=None, min_dist=0, spacing=True):
+    """Take up to `count` (x, y) spots from shuffled `candidates` (tile indices).
+
+    Skips tiles marked in `blocked` and, with min_dist, tiles closer than
+    that to `near`; every spot taken blocks its SPAWN_SPACING neighbourhood
+    (only its own tile without `spacing`).
+    """
+    w = grid.width
+    spots = []
+    for i in candidates:
+        if len(spots) == count:
+            break
+        if blocked[i]:
+            continue
+        x, y = i % w, i // w
+        if min_dist > 0 and abs(x - near[0]) + abs(y - near[1]) < min_dist:
+            continue
+        spots.append((x, y))
+        if spacing:
+            block_spacing(grid, blocked, x, y)
+        else:
+            blocked[i] = 1
+    return spots
+
+
+class Level:
+    """A fully generated level, built off the main thread and swapped in whole.
+
+    Each level owns its RNG so a worker thread never touches the game's
+    `rng`. With `store` its enemies live in an EnemyStore.
+    """
+    def __init__(self, number, rng, store=False):
+        self.number = number
+        self.rng = rng
+        self.store = store
+        self.grid = Grid()
+        self.free_cells = set()
+        self.px = self.py = 0
+        self.portal_x = self.portal_y = 0
+        self.enemies = []
+        self.enemy_store = None
+        self.pellet_target = 0
+        self.tiles = bytearray()
+
+    @classmethod
+    def build(cls, number, seed, store=False):
+        """Generate level `number`, retrying wall layouts that can't fit it"""
+        error = None
+        for _ in range(LEVEL_ATTEMPTS):
+            level = cls(number, random.Random(seed), store)
+            seed = level.rng.getrandbits(64)
+            try:
+                level.generate()
+                return level
+            except PlacementError as err:
+                error = err
+        raise error
+
+    def generate(self):
         """Generate random dungeon level"""
-        # Initialize empty map
-        self.walls = set()
+        rng = self.rng
+        grid = self.grid
         
         # Add border walls
         for x in range(MAP_W):
-            self.walls.add((x, 0))
-            self.walls.add((x, MAP_H - 1))
+            grid.set_flag(x, 0, CELL_WALL)
+            grid.set_flag(x, MAP_H - 1, CELL_WALL)
         for y in range(MAP_H):
-            self.walls.add((0, y))
-            self.walls.add((MAP_W - 1, y))
+            grid.set_flag(0, y, CELL_WALL)
+            grid.set_flag(MAP_W - 1, y, CELL_WALL)
         
         # Add random internal walls
-        num_walls = random.randint(20, 40)
+        num_walls = rng.randint(20, 40)
         for _ in range(num_walls):
-            x = random.randint(1, MAP_W - 2)
-            y = random.randint(1, MAP_H - 2)
-            self.walls.add((x, y))
+            x = rng.randint(1, MAP_W - 2)
+            y = rng.randint(1, MAP_H - 2)
+            grid.set_flag(x, y, CELL_WALL)
         
-        # Initialize collections before finding spots
-        self.enemies = []
-        self.pellet_positions = []
+        # Everything spawns in one connected region
+        self.free_cells = self.seal_pockets()
+        self.tiles = autotile(grid)
         
         # Place player (find empty spot)
         self.px, self.py = self.find_empty_spot()
+        self.free_cells.discard(grid.index(self.px, self.py))
+        
+        self.portal_x, self.portal_y = self.find_empty_spot(min_dist=5)
+        self.free_cells.discard(grid.index(self.portal_x, self.portal_y))
+        grid.set_flag(self.portal_x, self.portal_y, CELL_PORTAL)
+        
+        # Place enemies (more per level) and pellets in one pass; late levels
+        # stop growing once they'd crowd the floor
+        room = len(self.free_cells) // SPAWN_ROOM
+        num_enemies = min(2 + self.number, room // 2)
+        num_pellets = min(5 + self.number, room - num_enemies)
+        enemy_spots, pellet_spots = self.place_spots(
+            [(num_enemies, 3), (num_pellets, 0)]
+        )
+        if self.store:
+            self.enemy_store = EnemyStore(num_enemies)
+        for ex, ey in enemy_spots:
+            if self.enemy_store is not None:
+                enemy = self.enemy_store.add(ex, ey)
+            else:
+                enemy = Enemy(ex, ey)
+            self.enemies.append(enemy)
+            grid.add_enemy(enemy)
+        
+        self.pellet_target = num_pellets
+        for px, py in pellet_spots:
+            grid.set_flag(px, py, CELL_PELLET)
+
+    def seal_pockets(self):
+        """Flood fill the floor, keep the largest region and wall the rest.
+
+        Returns the floor tiles of the kept region, so anything placed in it
+        is reachable from everything else.
+        """
+        grid = self.grid
+        w = grid.width
+        cells = grid.cells
+        seen = bytearray(len(cells))
+        best = set()
+        for start, cell in enumerate(cells):
+            if cell & CELL_WALL or seen[start]:
+                continue
+            region = {start}
+            seen[start] = 1
+            queue = deque([start])
+            while queue:
+                i = queue.popleft()
+                x, y = i % w, i // w
+                for dx, dy in DIR_DELTA:
+                    if grid.is_wall(x + dx, y + dy):
+                        continue
+                    n = i + dy * w + dx
+                    if not seen[n]:
+                        seen[n] = 1
+                        region.add(n)
+                        queue.append(n)
+            if len(region) > len(best):
+                for i in best:
+                    cells[i] |= CELL_WALL
+                best = region
+            else:
+                for i in region:
+                    cells[i] |= CELL_WALL
+        return best
+    
+    def place_spots(self, batches):
+        """Place batches of spawns in one shuffled pass over the free cells.
+
+        `batches` is a list of (count, min_dist) pairs, min_dist being the
+        distance from the player. Returns one list of (x, y) spots per batch,
+        all kept SPAWN_SPACING apart from each other and from existing pellets
+        and enemies. A batch that doesn't fit that way drops the spacing, then
+        min_dist; PlacementError is left for more spawns than free tiles.
+        """
+        grid = self.grid
+        w = grid.width
+        near = (self.px, self.py)
+        
+        # Tiles too close to something already spawned, and tiles taken
+        blocked = bytearray(len(grid.cells))
+        taken = bytearray(len(grid.cells))
+        for i, cell in enumerate(grid.cells):
+            if cell & (CELL_PELLET | CELL_ENEMY):
+                block_spacing(grid, blocked, i % w, i // w)
+                taken[i] = 1
+        
+        candidates = list(self.free_cells)
+        self.rng.shuffle(candidates)
+        
+        results = []
+        for count, min_dist in batches:
+            spots = take_spots(grid, candidates, blocked, count, near, min_dist)
+            for dist in (min_dist, 0):
+                if len(spots) == count:
+                    break
+                for x, y in spots:
+                    taken[y * w + x] = 1
+                spots += take_spots(
+                    grid, candidates, taken, count - len(spots), near, dist, spacing=False
+                )
+            for x, y in spots:
+                block_spacing(grid, blocked, x, y)
+                taken[y * w + x] = 1
+            if len(spots) < count:
+                raise PlacementError(
+                    f"Level {self.number}: only {len(spots)} of {count} spawns fit "
+                    f"with min_dist={min_dist} and spacing {SPAWN_SPACING} "
+                    f"({len(self.free_cells)} free tiles)"
+                )
+            results.append(spots)
+        
+        for spots in results:
+            for x, y in spots:
+                self.free_cells.discard(y * w + x)
+        return results
+    
+    def find_empty_spot(self, min_dist=0):
+        """Find random empty tile, optionally far from player"""
+        return self.place_spots([(1, min_dist)])[0][0]
+
+    def tile_blocks(self):
+        """(tile x, tile y, width, sprite rows) blocks to bake into tilemap 0"""
+        return [(0, 0, self.grid.width, self.tiles)]
+
+    def stream(self, x, y):
+        """Fixed levels are fully loaded: nothing to stream in or out"""
+        return (), (), ()
+
+    def open_portal(self, x, y):
+        return self.portal_x, self.portal_y
+
+
+class World:
+    """Streamed level: a large map generated chunk by chunk around the player.
+
+    Chunks are rebuilt from (seed, cx, cy) whenever they're loaded, so only
+    the resident chunks (at most CHUNK_CACHE) take memory; anything changed in
+    an evicted chunk (pellets eaten, enemies killed) respawns with it. Every
+    chunk keeps a floor ring on its border, which joins it to its neighbours
+    and keeps the whole world connected.
+    """
+    def __init__(self, number, seed, size):
+        self.number = number
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.grid = ChunkGrid(size, size)
+        self.center = None
+        self.enemies = []
+        self.enemy_store = None
+        # Chunk corners are always floor
+        self.px = self.py = size // 2 // CHUNK * CHUNK
+        self.portal_x = self.portal_y = None
+        self.pellet_target = 5 + number
+
+    @classmethod
+    def build(cls, number, seed, size):
+        """Create world `number` with the chunks around its spawn loaded"""
+        world = cls(number, seed, size)
+        _, loaded, _ = world.stream(world.px, world.py)
+        for chunk in loaded:
+            world.enemies.extend(chunk_enemies(chunk))
+        return world
+
+    def tile_blocks(self):
+        """(tile x, tile y, width, sprite rows) blocks to bake into tilemap 0"""
+        return [
+            (chunk.cx * CHUNK, chunk.cy * CHUNK, CHUNK, chunk.tiles)
+            for chunk in self.nearby()
+        ]
+
+    def nearby(self):
+        """Loaded chunks within CHUNK_RADIUS of the centre chunk"""
+        cx, cy = self.center
+        chunks = self.grid.chunks
+        return [
+            chunks[(nx, ny)]
+            for ny in range(cy - CHUNK_RADIUS, cy + CHUNK_RADIUS + 1)
+            for nx in range(cx - CHUNK_RADIUS, cx + CHUNK_RADIUS + 1)
+            if (nx, ny) in chunks
+        ]
+
+    def stream(self, x, y):
+        """Load the chunks around tile (x, y) and evict the least recently used.
+
+        Returns (nearby, loaded, evicted) chunk lists; all empty while (x, y)
+        stays in the same chunk.
+        """
+        center = (x // CHUNK, y // CHUNK)
+        if center == self.center:
+            return (), (), ()
+        self.center = center
+
+        grid = self.grid
+        chunks = grid.chunks
+        size_x = (grid.width + CHUNK - 1) // CHUNK
+        size_y = (grid.height + CHUNK - 1) // CHUNK
+        cx, cy = center
+        loaded = []
+        for ny in range(max(cy - CHUNK_RADIUS, 0), min(cy + CHUNK_RADIUS + 1, size_y)):
+            for nx in range(max(cx - CHUNK_RADIUS, 0), min(cx + CHUNK_RADIUS + 1, size_x)):
+                if (nx, ny) in chunks:
+                    chunks.move_to_end((nx, ny))
+                else:
+                    chunks[(nx, ny)] = self.make_chunk(nx, ny)
+                    loaded.append(chunks[(nx, ny)])
+
+        evicted = []
+        while len(chunks) > CHUNK_CACHE:
+            evicted.append(chunks.popitem(last=False)[1])
+        return self.nearby(), loaded, evicted
+
+    def make_chunk(self, cx, cy):
+        """Generate chunk (cx, cy) from the world seed"""
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+        chunk = Chunk(cx, cy)
+        for _ in range(rng.randint(20, 40)):
+            chunk.set_flag(rng.randint(1, CHUNK - 2), rng.randint(1, CHUNK - 2), CELL_WALL)
+        free = self.seal_chunk(chunk)
+        chunk.tiles = autotile(chunk)
+
+        ox, oy = cx * CHUNK, cy * CHUNK
+        spawn = (self.px - ox, self.py - oy)
+        if (self.portal_x, self.portal_y) != (None, None):
+            if ox <= self.portal_x < ox + CHUNK and oy <= self.portal_y < oy + CHUNK:
+                chunk.set_flag(self.portal_x - ox, self.portal_y - oy, CELL_PORTAL)
+                free.discard(chunk.index(self.portal_x - ox, self.portal_y - oy))
+
+        # No enemies next to the spawn point
+        has_spawn = 0 <= spawn[0] < CHUNK and 0 <= spawn[1] < CHUNK
+        num_enemies = 0 if has_spawn else rng.randint(0, 1 + self.number // 4)
+        num_pellets = rng.randint(0, 2)
+        blocked = bytearray(len(chunk.cells))
+        if has_spawn:
+            block_spacing(chunk, blocked, *spawn)
+        candidates = sorted(free)
+        rng.shuffle(candidates)
+        for x, y in take_spots(chunk, candidates, blocked, num_enemies):
+            enemy = Enemy(ox + x, oy + y)
+            chunk.add_at(enemy, chunk.index(x, y))
+        for x, y in take_spots(chunk, candidates, blocked, num_pellets):
+            chunk.set_flag(x, y, CELL_PELLET)
+        return chunk
+
+    def seal_chunk(self, chunk):
+        """Wall off floor that can't be reached from the chunk's border ring.
+
+        Returns the reachable floor tiles off the ring (spawn candidates).
+        """
+        w = chunk.width
+        cells = chunk.cells
+        seen = bytearray(len(cells))
+        queue = deque()
+        for i in range(len(cells)):
+            x, y = i % w, i // w
+            if x in (0, w - 1) or y in (0, chunk.height - 1):
+                seen[i] = 1
+                queue.append(i)
+        free = set()
+        while queue:
+            i = queue.popleft()
+            x, y = i % w, i // w
+            for dx, dy in DIR_DELTA:
+                if chunk.is_wall(x + dx, y + dy):
+                    continue
+                n = i + dy * w + dx
+                if not seen[n]:
+                    seen[n] = 1
+                    free.add(n)
+                    queue.append(n)
+        for i in range(len(cells)):
+            if not seen[i]:
+                cells[i] |= CELL_WALL
+        return free
+
+    def open_portal(self, x, y):
+        """Place the portal on a free loaded tile 5-8 steps from (x, y)"""
+        grid = self.grid
+        spots = [
+            (x + dx, y + dy)
+            for dy in range(-8, 9)
+            for dx in range(-8, 9)
+            if 5 <= abs(dx) + abs(dy) <= 8
+            and grid.cell(x + dx, y + dy) & (CELL_WALL | CELL_ENEMY | CELL_PELLET) == 0
+        ]
+        if spots:
+            self.portal_x, self.portal_y = self.rng.choice(spots)
+        else:
+            # Chunk corners are always floor, so fall back to the nearest one
+            self.portal_x = min((x + CHUNK // 2) // CHUNK * CHUNK, grid.width - CHUNK)
+            self.portal_y = min((y + CHUNK // 2) // CHUNK * CHUNK, grid.height - CHUNK)
+        grid.set_flag(self.portal_x, self.portal_y, CELL_PORTAL)
+        return self.portal_x, self.portal_y
+
+
+def chunk_enemies(chunk):
+    """Enemies currently standing in a chunk"""
+    return [enemy for bucket in chunk.occupants if bucket for enemy in bucket]
+
+
+def wrap_spans(start, length, span):
+    """Math: split [start, start + length) into runs that don't cross a multiple of span.
+
+    Yields (start, start % span, run length).
+    """
+    while length > 0:
+        offset = start % span
+        run = min(length, span - offset)
+        yield start, offset, run
+        start += run
+        length -= run
+
+
+class Game:
+    def __init__(self, world_size=WORLD_SIZE, seed=None, controls=None, profiler=None,
+                 enemy_store=False):
+        # EnemyStore is opt-in (--store): NumPy only pays off for big packs
+        if enemy_store and np is None:
+            raise ImportError("enemy_store needs NumPy")
+        if enemy_store and world_size:
+            raise ValueError("enemy_store only works with fixed levels, not streamed worlds")
+        pyxel.init(VIEW_W * TILE, VIEW_H * TILE, title="Dungeon Crawler")
+        pyxel.load("Dungeon.pyxres")
+        
+        # Fog of war layer, repainted only when the view or FOV changes
+        self.fov = FieldOfView()
+        self.fog = pyxel.Image((VIEW_W + 1) * TILE, (VIEW_H + 1) * TILE)
+        self.fog_dim = pyxel.Image(TILE, TILE)
+        for y in range(TILE):
+            for x in range(TILE):
+                self.fog_dim.pset(x, y, COLOR_FOG if (x + y) % 2 else COLOR_FOG_CLEAR)
+        self.fog_origin = None
+        self.fog_visible = None
+        
+        self.level = 1
+        self.score = 0
+        self.world_size = world_size
+        self.enemy_store = None
+        self.use_store = enemy_store
+        # Level seeds come from here, so one seed replays the same dungeon;
+        # a replayed session brings its recorded seed along
+        self.controls = controls or Controls(INPUT_KEYS, seed=seed)
+        self.rng = random.Random(self.controls.seed)
+        self.timers = TimerWheel()
+        self.enemies = []
+        self.moves = []
+        self.reservations = Reservations()
+        self.level_worker = ThreadPoolExecutor(max_workers=1)
+        
+        # Before the first level: its enemy timers hold the timed wake_enemy
+        if profiler is not None:
+            profiler.attach(self, PROFILE_PHASES)
+        
+        # Generate first level, then keep the next one building in background
+        self.generate_level()
+        self.prepare_next_level()
+        
+        # Game time runs in fixed ticks, whatever the frame rate
+        self.loop = FixedStep(self.update, self.draw, self.controls.sample)
+        self.loop.run()
+    
+    def generate_level(self):
+        """Generate the current level right now (first level only)"""
+        self.load_level(self.build_level(self.level, self.rng.getrandbits(64)))
+    
+    def prepare_next_level(self):
+        """Start building the next level on the worker thread"""
+        self.next_level = self.level_worker.submit(
+            self.build_level, self.level + 1, self.rng.getrandbits(64)
+        )
+
+    def close(self):
+        """Stop the level worker; for drivers that run many games in one process"""
+        self.controls.close()
+        self.next_level.cancel()
+        self.level_worker.shutdown(wait=False)
+
+    def build_level(self, number, seed):
+        """A fixed Level, or a streamed World when world_size is set"""
+        if self.world_size:
+            return World.build(number, seed, self.world_size)
+        return Level.build(number, seed, self.use_store)
+    
+    def load_level(self, level):
+        """Swap a generated level in"""
+        self.stage = level
+        self.grid = level.grid
+        self.flow = FlowField(
+            min(FLOW_WINDOW, self.grid.width), min(FLOW_WINDOW, self.grid.height)
+        )
+        self.fov.reset()
+        self.baked = {}
+        for block in level.tile_blocks():
+            self.bake_tilemap(*block)
+        
+        # Old enemies stop waking up; new ones count from the current frame
+        for enemy in self.enemies:
+            if enemy.timer is not None:
+                enemy.timer.cancel()
+        self.enemies = level.enemies
+        self.enemy_store = level.enemy_store
+        now = self.timers.now
+        if self.enemy_store is not None:
+            self.enemy_store.start(now)
+        else:
+            for enemy in self.enemies:
+                enemy.start(now)
+                enemy.timer = self.timers.at(enemy.move_at, self.wake_enemy, enemy)
+        
+        self.px, self.py = level.px, level.py
         self.screen_x = self.px * TILE
         self.screen_y = self.py * TILE
         self.dir = DIR_DOWN
         self.state = STATE_IDLE
         self.speed = 2
         
-        self.portal_x, self.portal_y = self.find_empty_spot(min_dist=5)
+        self.portal_x, self.portal_y = level.portal_x, level.portal_y
         self.portal_active = False
         
-        # Place enemies
-        num_enemies = 2 + self.level  # More enemies per level
-        for _ in range(num_enemies):
-            ex, ey = self.find_empty_spot(min_dist=3)
-            self.enemies.append(Enemy(ex, ey))
-        
         # Count pellets (optional objective)
-        self.pellets = 0
-        self.pellet_positions = []
-        for _ in range(5 + self.level):
-            px, py = self.find_empty_spot()
-            self.pellet_positions.append((px, py))
-            self.pellets += 1
+        self.pellets = level.pellet_target
+        
+        # Light the spawn now, or the first frame is drawn under full fog
+        self.fov.update(self.px, self.py, self.grid)
     
-    def find_empty_spot(self, min_dist=0):
-        """Find random empty tile, optionally far from player"""
-        while True:
-            x = random.randint(1, MAP_W - 2)
-            y = random.randint(1, MAP_H - 2)
-            if (x, y) not in self.walls:
-                # Check distance from player
-                if min_dist > 0:
-                    dist = abs(x - self.px) + abs(y - self.py)
-                    if dist < min_dist:
-                        continue
-                
-                # Check distance from other objects
-                too_close = False
-                for ex, ey in self.pellet_positions:
-                    if abs(x - ex) + abs(y - ey) < 2:
-                        too_close = True
-                        break
-                for enemy in self.enemies:
-                    if abs(x - enemy.x) + abs(y - enemy.y) < 2:
-                        too_close = True
-                        break
-                if not too_close:
-                    return (x, y)
+    def bake_tilemap(self, tx, ty, w, tiles):
+        """Write a block of floor and wall tiles into tilemap 0 once.
+
+        Streamed worlds are bigger than the tilemap, so tile (x, y) goes to
+        (x % TILEMAP_SIZE, y % TILEMAP_SIZE); `baked` remembers which block
+        owns each spot so a block is rewritten if something overwrote it.
+        """
+        tilemap = pyxel.tilemaps[0]
+        for i, row in enumerate(tiles):
+            x = (tx + i % w) % TILEMAP_SIZE
+            y = (ty + i // w) % TILEMAP_SIZE
+            tilemap.pset(x, y, (MAP1_OFFSET, row))
+        self.baked[(tx % TILEMAP_SIZE, ty % TILEMAP_SIZE)] = tiles
+    
+    def stream_chunks(self):
+        """Load and evict chunks as the player crosses chunk borders"""
+        nearby, loaded, evicted = self.stage.stream(self.px, self.py)
+        for chunk in nearby:
+            tx, ty = chunk.cx * CHUNK, chunk.cy * CHUNK
+            if self.baked.get((tx % TILEMAP_SIZE, ty % TILEMAP_SIZE)) is not chunk.tiles:
+                self.bake_tilemap(tx, ty, CHUNK, chunk.tiles)
+        if not loaded and not evicted:
+            return
+        self.flow.invalidate()
+        self.fov.invalidate()
+        # Explored memory goes with its chunk, which respawns unexplored
+        for chunk in evicted:
+            self.fov.forget(chunk.cx * CHUNK, chunk.cy * CHUNK, CHUNK, CHUNK)
+        
+        now = self.timers.now
+        for chunk in loaded:
+            for enemy in chunk_enemies(chunk):
+                enemy.start(now)
+                enemy.timer = self.timers.at(enemy.move_at, self.wake_enemy, enemy)
+                self.enemies.append(enemy)
+        
+        # Evicted enemies go to sleep for good (their chunk respawns them)
+        gone = set()
+        for chunk in evicted:
+            for enemy in chunk_enemies(chunk):
+                if enemy.timer is not None:
+                    enemy.timer.cancel()
+                gone.add(id(enemy))
+        if gone:
+            self.enemies = [e for e in self.enemies if id(e) not in gone]
     
     def update(self):
+        self.controls.poll()
+        
         # Player movement
         self.update_player()
+        self.stream_chunks()
+        self.fov.update(self.px, self.py, self.grid)
         
         # Check pellets
         self.check_pellets()
@@ -328,9 +1511,7 @@ class Game:
         # Update portal
         self.check_portal()
         
-        # Update enemies
-        for enemy in self.enemies:
-            enemy.update(self.px, self.py, self.walls, self.enemies)
+        self.update_enemies()
         
         # Smooth screen movement
         self.update_screen_pos()
@@ -338,28 +1519,78 @@ class Game:
         # Check enemy collisions
         self.check_enemy_collisions()
     
+    def update_enemies(self):
+        """One shared path search per player tile change; the timer wheel
+        only wakes enemies with something due this frame"""
+        self.flow.update(self.px, self.py, self.grid)
+        self.reservations.clear()
+        self.timers.advance()
+        self.resolve_moves()
+        if self.enemy_store is not None:
+            self.enemy_store.update(
+                self.px, self.py, self.grid, self.reservations, self.flow, self.timers.now
+            )
+    
+    def entity_counts(self):
+        """Live entities, for the profiler"""
+        return {"enemies": len(self.enemies), "pellets": self.pellets}
+    
+    def wake_enemy(self, enemy):
+        """Timer callback: update one enemy and schedule its next wake-up"""
+        delay = enemy.update(self.px, self.py, self.grid, self.moves, self.flow, self.timers.now)
+        enemy.timer = None
+        if delay:
+            enemy.timer = self.timers.schedule(delay, self.wake_enemy, enemy)
+    
+    def resolve_moves(self):
+        """Step every enemy that woke up wanting to move, in one pass.
+
+        Enemies closest to the player claim their tile first, so the front
+        of a pack clears the way for the ones behind it. EnemyStore uses the
+        same order.
+        """
+        if not self.moves:
+            return
+        moves, self.moves = self.moves, []
+        flow = self.flow
+        if len(moves) > 1:
+            # Unreached tiles (-1) wrap around to the end; ties go top to
+            # bottom, left to right
+            moves.sort(key=lambda e: (flow.distance_at(e.x, e.y) % (1 << 30), e.y, e.x))
+        now = self.timers.now
+        for enemy in moves:
+            enemy.step(self.grid, self.reservations, flow)
+            enemy.slide()
+            enemy.timer = self.timers.schedule(enemy.next_wake(now), self.wake_enemy, enemy)
+    
+    def nudge_enemy(self, enemy):
+        """Wake an enemy next frame after moving it from outside its update"""
+        if enemy.timer is not None:
+            enemy.timer.cancel()
+            enemy.timer = self.timers.schedule(1, self.wake_enemy, enemy)
+    
     def update_player(self):
         # Only move if player has reached center of tile
         if self.screen_x == self.px * TILE and self.screen_y == self.py * TILE:
             dx, dy = 0, 0
-            if pyxel.btn(pyxel.KEY_UP):
+            if self.controls.btn(pyxel.KEY_UP):
                 dx, dy = 0, -1
                 self.dir = DIR_UP
-            elif pyxel.btn(pyxel.KEY_DOWN):
+            elif self.controls.btn(pyxel.KEY_DOWN):
                 dx, dy = 0, 1
                 self.dir = DIR_DOWN
-            elif pyxel.btn(pyxel.KEY_LEFT):
+            elif self.controls.btn(pyxel.KEY_LEFT):
                 dx, dy = -1, 0
                 self.dir = DIR_LEFT
-            elif pyxel.btn(pyxel.KEY_RIGHT):
+            elif self.controls.btn(pyxel.KEY_RIGHT):
                 dx, dy = 1, 0
                 self.dir = DIR_RIGHT
-            elif pyxel.btn(pyxel.KEY_SPACE):
+            elif self.controls.btn(pyxel.KEY_SPACE):
                 # Attack
                 self.state = STATE_ATTACK
                 self.attack_enemies()
                 return
-            elif pyxel.btn(pyxel.KEY_Z):
+            elif self.controls.btn(pyxel.KEY_Z):
                 # Swipe
                 self.state = STATE_SWIPE
                 self.attack_enemies()
@@ -381,57 +1612,49 @@ class Game:
     
     def attack_enemies(self):
         """Attack enemies in front of player"""
-        attack_range = 1
-        for enemy in self.enemies:
-            if not enemy.alive:
-                continue
-            
-            # Calculate enemy position relative to player
-            ex, ey = enemy.x, enemy.y
-            dx = ex - self.px
-            dy = ey - self.py
-            
-            # Check if enemy is in attack range and direction
-            in_range = abs(dx) <= attack_range and abs(dy) <= attack_range
-            if not in_range:
-                continue
-            
-            # Check direction match
-            if self.dir == DIR_UP and dy < 0 and abs(dx) <= 1:
-                enemy.hp -= 1
-            elif self.dir == DIR_DOWN and dy > 0 and abs(dx) <= 1:
-                enemy.hp -= 1
-            elif self.dir == DIR_LEFT and dx < 0 and abs(dy) <= 1:
-                enemy.hp -= 1
-            elif self.dir == DIR_RIGHT and dx > 0 and abs(dy) <= 1:
+        # The swipe covers the 3 tiles of the row (or column) in front
+        fx, fy = DIR_DELTA[self.dir]
+        killed = False
+        for side in (-1, 0, 1):
+            tx = self.px + fx + (side if fx == 0 else 0)
+            ty = self.py + fy + (side if fy == 0 else 0)
+            for enemy in list(self.grid.enemies_at(tx, ty)):
+                if not enemy.alive:
+                    continue
                 enemy.hp -= 1
-            
-            # Check if enemy died
-            if enemy.hp <= 0:
-                enemy.alive = False
-                self.score += 100
-                # Remove dead enemies
-                self.enemies = [e for e in self.enemies if e.alive]
+                
+                # Check if enemy died
+                if enemy.hp <= 0:
+                    enemy.alive = False
+                    self.score += 100
+                    self.grid.remove_enemy(enemy)
+                    killed = True
+        
+        # Remove dead enemies in one pass
+        if killed:
+            self.enemies = [e for e in self.enemies if e.alive]
     
     def check_enemy_collisions(self):
         """Check if player is in enemy attack range"""
-        for enemy in self.enemies:
-            if enemy.alive:
-                # Check if player is on same tile (collision)
-                if self.px == enemy.x and self.py == enemy.y:
-                    if enemy.can_damage_player():
-                        self.score -= 10
-                        enemy.reset_damage_cooldown()
-                    # Push enemy away
-                    if enemy.x < self.px:
-                        enemy.x -= 1
-                    else:
-                        enemy.x += 1
-                # Check if player is in swipe attack zone
-                elif enemy.attacking and enemy.player_in_attack_range(self.px, self.py):
-                    if enemy.can_damage_player():
+        now = self.timers.now
+        
+        # Check if player is on same tile (collision)
+        for enemy in list(self.grid.enemies_at(self.px, self.py)):
+            if enemy.can_damage_player(now):
+                self.score -= 10
+                enemy.reset_damage_cooldown(now)
+            # Push enemy away (never onto another enemy)
+            if not self.grid.cell(enemy.x + 1, enemy.y) & (CELL_WALL | CELL_ENEMY):
+                self.grid.move_enemy(enemy, enemy.x + 1, enemy.y)
+                self.nudge_enemy(enemy)
+        
+        # Check if player is in swipe attack zone of a neighbour
+        for dx, dy in DIR_DELTA:
+            for enemy in self.grid.enemies_at(self.px + dx, self.py + dy):
+                if enemy.attacking and enemy.player_in_attack_range(self.px, self.py):
+                    if enemy.can_damage_player(now):
                         self.score -= 5
-                        enemy.reset_damage_cooldown()
+                        enemy.reset_damage_cooldown(now)
     
     def update_screen_pos(self):
         target_x = self.px * TILE
@@ -448,22 +1671,19 @@ class Game:
             self.screen_y = max(self.screen_y - self.speed, target_y)
 
     def is_wall(self, tx, ty):
-        if tx < 0 or ty < 0 or tx >= MAP_W or ty >= MAP_H:
-            return True
-        return (tx, ty) in self.walls
+        return self.grid.is_wall(tx, ty)
     
     def check_pellets(self):
         """Check if player collected pellet"""
-        for i, (px, py) in enumerate(self.pellet_positions):
-            if px == self.px and py == self.py:
-                self.pellet_positions.pop(i)
-                self.pellets -= 1
-                self.score += 10
-                
-                # Activate portal when all pellets collected
-                if self.pellets == 0:
-                    self.portal_active = True
-                break
+        if self.grid.has(self.px, self.py, CELL_PELLET):
+            self.grid.clear_flag(self.px, self.py, CELL_PELLET)
+            self.pellets -= 1
+            self.score += 10
+            
+            # Activate portal when all pellets collected
+            if self.pellets == 0:
+                self.portal_x, self.portal_y = self.stage.open_portal(self.px, self.py)
+                self.portal_active = True
     
     def update_portal_dir(self):
         """Math: determine portal direction based on player position"""
@@ -476,29 +1696,64 @@ class Game:
         return 0
 
     def check_portal(self):
-        if self.portal_active and self.px == self.portal_x and self.py == self.portal_y:
+        if self.portal_active and self.grid.has(self.px, self.py, CELL_PORTAL):
             # Next level!
             self.level += 1
             self.score += 500
-            self.generate_level()
+            self.load_level(self.next_level.result())
+            self.prepare_next_level()
+    
+    def camera_pos(self):
+        """Math: camera top-left in pixels, centred on the player and clamped to the map"""
+        view_w = VIEW_W * TILE
+        view_h = VIEW_H * TILE
+        cam_x = self.screen_x + TILE // 2 - view_w // 2
+        cam_y = self.screen_y + TILE // 2 - view_h // 2
+        cam_x = max(0, min(cam_x, self.grid.width * TILE - view_w))
+        cam_y = max(0, min(cam_y, self.grid.height * TILE - view_h))
+        return cam_x, cam_y
     
     def draw(self):
         pyxel.cls(0)
         
-        # Draw tilemap with pixel dimensions
-        # bltm(x, y, tilemap_index, u, v, width, height)
-        # 16 tiles * 8 pixels = 128 pixels
-        pyxel.bltm(0, 0, 0, 0, 0, MAP_W * TILE, MAP_H * TILE)
+        cam_x, cam_y = self.camera_pos()
+        pyxel.camera(cam_x, cam_y)
+        
+        # Draw the visible part of the tilemap (baked in load_level/stream_chunks)
+        # bltm(x, y, tilemap_index, u, v, width, height); one call unless the
+        # view straddles the tilemap's wrap-around edge
+        span = TILEMAP_SIZE * TILE
+        for x, u, w in wrap_spans(cam_x, VIEW_W * TILE, span):
+            for y, v, h in wrap_spans(cam_y, VIEW_H * TILE, span):
+                pyxel.bltm(x, y, 0, u, v, w, h)
         
-        # Draw pellets with sprite texture
-        for (px, py) in self.pellet_positions:
-            sx = SPRITE_PELLET * TILE
-            sy = SPRITE_PELLET * TILE
-            pyxel.blt(px * TILE, py * TILE, IMG_WORLD, sx, sy, TILE, TILE, 0)
+        # Pellets and enemies come from the grid cells in view (plus a tile
+        # of margin for enemies sliding in), not from whole-level lists.
+        # Pellets show once explored, enemies only while in sight
+        grid = self.grid
+        fov = self.fov
+        left = max(cam_x // TILE - 1, 0)
+        top = max(cam_y // TILE - 1, 0)
+        w = min(VIEW_W + 3, grid.width - left)
+        h = min(VIEW_H + 3, grid.height - top)
+        visible = []
+        for i, cell in enumerate(grid.window(left, top, w, h)):
+            if not cell & (CELL_PELLET | CELL_ENEMY):
+                continue
+            tx, ty = left + i % w, top + i // w
+            if (tx, ty) not in fov.explored:
+                continue
+            if cell & CELL_PELLET:
+                # Draw pellets with sprite texture
+                sx = SPRITE_PELLET * TILE
+                sy = SPRITE_PELLET * TILE
+                pyxel.blt(tx * TILE, ty * TILE, IMG_WORLD, sx, sy, TILE, TILE, 0)
+            if cell & CELL_ENEMY and (tx, ty) in fov.visible:
+                visible.extend(grid.enemies_at(tx, ty))
         
         # Draw portal if active with sprite
-        if self.portal_active:
-            frame = (pyxel.frame_count // 8) % PORTAL_FRAMES
+        if self.portal_active and (self.portal_x, self.portal_y) in fov.explored:
+            frame = (self.timers.now // 8) % PORTAL_FRAMES
             portal_rows = [SPRITE_PORTAL_FRONT, SPRITE_PORTAL_LEFT, SPRITE_PORTAL_RIGHT]
             portal_row = portal_rows[self.update_portal_dir()]
             sx = (MAP2_OFFSET + frame) * TILE
@@ -506,56 +1761,87 @@ class Game:
             pyxel.blt(self.portal_x * TILE, self.portal_y * TILE, IMG_WORLD, sx, sy, TILE, TILE, 0)
         
         # Draw enemies
-        for enemy in self.enemies:
-            if enemy.alive:
-                # Draw swipe attack if attacking (separate from enemy sprite)
-                if enemy.attacking:
-                    ax, ay = enemy.get_attack_pos()
-                    frame = (enemy.attack_timer // 4) % 4
-                    swipe_row = {
-                        DIR_UP: ENEMY_ROW_UP,
-                        DIR_DOWN: ENEMY_ROW_DOWN_SWIPE,
-                        DIR_LEFT: ENEMY_ROW_LEFT_SWIPE,
-                        DIR_RIGHT: ENEMY_ROW_RIGHT_SWIPE,
-                    }
-                    row = swipe_row.get(enemy.dir, ENEMY_ROW_DOWN_SWIPE)
-                    u = frame * TILE
-                    v = row * TILE
-                    pyxel.blt(ax * TILE, ay * TILE, IMG_ENEMY, u, v, TILE, TILE, 0)
-                
-                # Draw enemy sprite (keeps idle/walk sprite while attacking)
-                if enemy.state == STATE_WALK:
-                    frame = (pyxel.frame_count // 6) % 4
-                else:
-                    frame = 0
-                
-                # Get row based on direction (idle animation only, no attack sprite on enemy)
-                row = {
-                    DIR_UP: ENEMY_ROW_UP,
-                    DIR_DOWN: ENEMY_ROW_DOWN_IDLE,
-                    DIR_LEFT: ENEMY_ROW_LEFT_IDLE,
-                    DIR_RIGHT: ENEMY_ROW_RIGHT_IDLE,
-                }.get(enemy.dir, ENEMY_ROW_DOWN_IDLE)
-                
-                u = frame * TILE
-                v = row * TILE
-                
-                pyxel.blt(enemy.screen_x, enemy.screen_y, IMG_ENEMY, u, v, TILE, TILE, 0)
+        for enemy in visible:
+            self.draw_enemy(enemy)
+        
+        self.draw_fog(cam_x, cam_y)
         
         # Draw player
         self.draw_player()
         
         # UI
+        pyxel.camera()
         pyxel.text(5, 5, f"LEVEL: {self.level}", 7)
         pyxel.text(5, 15, f"SCORE: {self.score}", 7)
         pyxel.text(5, 25, f"PELLETS: {self.pellets}", 7)
         pyxel.text(5, 35, f"ENEMIES: {len(self.enemies)}", 7)
     
+    def draw_fog(self, cam_x, cam_y):
+        """Fog of war as one blt of a layer repainted only when it changes"""
+        ox, oy = cam_x // TILE, cam_y // TILE
+        if (ox, oy) != self.fog_origin or self.fov.visible is not self.fog_visible:
+            self.paint_fog(ox, oy)
+        pyxel.blt(
+            ox * TILE, oy * TILE, self.fog, 0, 0,
+            self.fog.width, self.fog.height, COLOR_FOG_CLEAR
+        )
+    
+    def paint_fog(self, ox, oy):
+        """Math: fog tile (tx, ty) covers map tile (ox + tx, oy + ty); dark if
+        unexplored, dithered if explored but out of sight, clear if visible"""
+        fog = self.fog
+        fov = self.fov
+        fog.cls(COLOR_FOG)
+        for ty in range(VIEW_H + 1):
+            for tx in range(VIEW_W + 1):
+                tile = (ox + tx, oy + ty)
+                if tile in fov.visible:
+                    fog.rect(tx * TILE, ty * TILE, TILE, TILE, COLOR_FOG_CLEAR)
+                elif tile in fov.explored:
+                    fog.blt(tx * TILE, ty * TILE, self.fog_dim, 0, 0, TILE, TILE)
+        self.fog_origin = (ox, oy)
+        self.fog_visible = fov.visible
+    
+    def draw_enemy(self, enemy):
+        # Draw swipe attack if attacking (separate from enemy sprite)
+        if enemy.attacking:
+            ax, ay = enemy.get_attack_pos()
+            frame = ((enemy.attack_until - self.timers.now) // 4) % 4
+            swipe_row = {
+                DIR_UP: ENEMY_ROW_UP,
+                DIR_DOWN: ENEMY_ROW_DOWN_SWIPE,
+                DIR_LEFT: ENEMY_ROW_LEFT_SWIPE,
+                DIR_RIGHT: ENEMY_ROW_RIGHT_SWIPE,
+            }
+            row = swipe_row.get(enemy.dir, ENEMY_ROW_DOWN_SWIPE)
+            u = frame * TILE
+            v = row * TILE
+            pyxel.blt(ax * TILE, ay * TILE, IMG_ENEMY, u, v, TILE, TILE, 0)
+        
+        # Draw enemy sprite (keeps idle/walk sprite while attacking)
+        if enemy.state == STATE_WALK:
+            frame = (self.timers.now // 6) % 4
+        else:
+            frame = 0
+        
+        # Get row based on direction (idle animation only, no attack sprite on enemy)
+        row = {
+            DIR_UP: ENEMY_ROW_UP,
+            DIR_DOWN: ENEMY_ROW_DOWN_IDLE,
+            DIR_LEFT: ENEMY_ROW_LEFT_IDLE,
+            DIR_RIGHT: ENEMY_ROW_RIGHT_IDLE,
+        }.get(enemy.dir, ENEMY_ROW_DOWN_IDLE)
+        
+        u = frame * TILE
+        v = row * TILE
+        
+        pyxel.blt(enemy.screen_x, enemy.screen_y, IMG_ENEMY, u, v, TILE, TILE, 0)
+    
     def draw_player(self):
         if self.state == STATE_WALK:
-            frame = (pyxel.frame_count // 6) % 4
+            frame = (self.timers.now // 6) % 4
         elif self.state in (STATE_ATTACK, STATE_SWIPE):
-            frame = (pyxel.frame_count // 8) % 4
+            frame = (self.timers.now // 8) % 4
         else:
             frame = 0
 
@@ -576,4 +1862,6 @@ class Game:
         )
 
 
-Game()
+if __name__ == "__main__":
+    Game(controls=Controls.from_argv(sys.argv, INPUT_KEYS), profiler=Profiler.from_argv(sys.argv),
+         enemy_store="--store" in sys.argv)
@@ -0,0 +1,192 @@
+# =====================
+# DUNGEON BATCH RUNNER
+# =====================
+# Plays many independent Dungeon games at full speed for balancing and AI
+# tuning. Every run is a fresh Game on the headless backend with its own
+# seed, so a run is fully determined by (seed, policy, ticks) and runs can
+# be spread over a process pool with nothing shared between them.
+#
+#   python DungeonBatch.py --runs 1000 --ticks 3000 --workers 8
+
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import Headless
+
+Headless.install()
+import Dungeon  # noqa: E402  (must see the headless pyxel)
+
+DEFAULT_RUNS = 64
+DEFAULT_TICKS = 3000
+CHUNKSIZE = 4         # Runs handed to a worker at a time
+BOT_SEARCH = 4096     # Tiles the bot's path search may visit
+
+MOVE_KEYS = (Headless.KEY_DOWN, Headless.KEY_LEFT, Headless.KEY_RIGHT, Headless.KEY_UP)  # by DIR_*
+RANDOM_KEYS = MOVE_KEYS + (Headless.KEY_SPACE, Headless.KEY_Z)
+
+
+# =====================
+# INPUT POLICIES
+# =====================
+class Bot:
+    """Walks the shortest path to the nearest pellet (the portal once it's
+    open) and attacks whatever stands on the next step."""
+
+    def __init__(self, game, seed):
+        self.game = game
+        self.rng = random.Random(seed)
+        self.keys = frozenset()
+
+    def __call__(self, frame):
+        game = self.game
+        # Input is only read when the player is centred on a tile
+        if game.screen_x != game.px * Dungeon.TILE or game.screen_y != game.py * Dungeon.TILE:
+            return self.keys
+
+        direction = self.next_step()
+        if direction is None:
+            direction = self.rng.randrange(4)
+        dx, dy = Dungeon.DIR_DELTA[direction]
+        if game.dir == direction and game.grid.has(game.px + dx, game.py + dy, Dungeon.CELL_ENEMY):
+            self.keys = frozenset((Headless.KEY_SPACE,))
+        else:
+            self.keys = frozenset((MOVE_KEYS[direction],))
+        return self.keys
+
+    def next_step(self):
+        """First direction on the path to the closest goal, or None"""
+        game = self.game
+        grid = game.grid
+        goal = Dungeon.CELL_PORTAL if game.portal_active else Dungeon.CELL_PELLET
+        start = (game.px, game.py)
+        first = {start: None}
+        queue = deque((start,))
+        while queue and len(first) < BOT_SEARCH:
+            x, y = queue.popleft()
+            if grid.cell(x, y) & goal and (x, y) != start:
+                return first[(x, y)]
+            for direction, (dx, dy) in enumerate(Dungeon.DIR_DELTA):
+                nxt = (x + dx, y + dy)
+                if nxt in first or grid.cell(*nxt) & Dungeon.CELL_WALL:
+                    continue
+                first[nxt] = direction if (x, y) == start else first[(x, y)]
+                queue.append(nxt)
+        return None
+
+
+def make_input(policy, game, seed):
+    if policy == "bot":
+        return Bot(game, seed)
+    return Headless.random_input(seed, keys=RANDOM_KEYS, hold=8)
+
+
+# =====================
+# RUNS
+# =====================
+def run_one(job):
+    """Play one game for `ticks` ticks and return its stats.
+
+    An exception ends the run instead of the batch: the result then has
+    `error` set and the stats up to the failing tick.
+    """
+    seed, ticks, policy, world_size, store = job
+    Headless.reset()
+    game = None
+    level = 1
+    entered = 0
+    played = 0
+    portal_ticks = []
+    error = None
+    start = time.perf_counter()
+    try:
+        game = Dungeon.Game(world_size=world_size, seed=seed, enemy_store=store)
+        update, draw = Headless.app
+        keys = make_input(policy, game, seed)
+        level = game.level
+        for tick in range(ticks):
+            Headless.step(update, draw, keys(tick))
+            played = tick + 1
+            if game.level != level:
+                portal_ticks.append(played - entered)
+                level, entered = game.level, played
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+    seconds = time.perf_counter() - start
+    if game is not None:
+        game.close()
+
+    return {
+        "seed": seed,
+        "ticks": played,
+        "seconds": seconds,
+        "level": game.level if game is not None else level,
+        "levels_cleared": game.level - 1 if game is not None else 0,
+        "score": game.score if game is not None else 0,
+        "ticks_to_portal": portal_ticks,
+        "error": error,
+    }
+
+
+def run_batch(runs=DEFAULT_RUNS, ticks=DEFAULT_TICKS, workers=None, seed=0,
+              policy="bot", world_size=None, store=False):
+    """Play `runs` games over a process pool; returns the per-run stats"""
+    jobs = [(seed + i, ticks, policy, world_size, store) for i in range(runs)]
+    if workers == 1:
+        return [run_one(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, jobs, chunksize=CHUNKSIZE))
+
+
+def summarize(results, seconds):
+    """Aggregate per-run stats into one dict; failed runs are counted and
+    listed, the other stats come from the runs that finished"""
+    failed = [r for r in results if r["error"] is not None]
+    ticks = sum(r["ticks"] for r in results)
+    results = [r for r in results if r["error"] is None]
+    levels = [r["levels_cleared"] for r in results]
+    scores = [r["score"] for r in results]
+    portal = [t for r in results for t in r["ticks_to_portal"]]
+    return {
+        "runs": len(results) + len(failed),
+        "runs_failed": len(failed),
+        "ticks": ticks,
+        "seconds": seconds,
+        "ticks_per_second": ticks / seconds if seconds else 0.0,
+        "levels_cleared_total": sum(levels),
+        "levels_cleared_mean": statistics.fmean(levels) if levels else 0.0,
+        "levels_cleared_max": max(levels, default=0),
+        "score_mean": statistics.fmean(scores) if scores else 0.0,
+        "score_min": min(scores, default=0),
+        "score_max": max(scores, default=0),
+        "ticks_to_portal_mean": statistics.fmean(portal) if portal else None,
+        "ticks_to_portal_median": statistics.median(portal) if portal else None,
+        "failures": [(r["seed"], r["level"], r["error"]) for r in failed],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless Dungeon games in parallel")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS, help="ticks per run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="1 runs in-process")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first run")
+    parser.add_argument("--policy", choices=("bot", "random"), default="bot")
+    parser.add_argument("--world", type=int, default=None, help="streamed world size")
+    parser.add_argument("--store", action="store_true", help="keep enemies in an EnemyStore")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_batch(args.runs, args.ticks, args.workers, args.seed, args.policy, args.world,
+                        args.store)
+    stats = summarize(results, time.perf_counter() - start)
+    for key, value in stats.items():
+        print(f"{key:<24} {value:.2f}" if isinstance(value, float) else f"{key:<24} {value}")
+
+
+if __name__ == "__main__":
+    main()
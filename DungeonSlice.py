@@ -1,6 +1,18 @@
 import pyxel
 import random
 import math
+import sys
+from collections import Counter
+from array import array
+from TimerWheel import TimerWheel
+from Controls import Controls
+from FixedStep import FixedStep
+from Profiler import Profiler
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only horde steering needs it
+    np = None
 
 # =====================
 # CONSTANTS
@@ -20,6 +32,37 @@ JOY_CENTER_Y = (HEIGHT_TILES * TILE) - 30
 JOY_RADIUS = 15
 JOY_KNOB_RADIUS = 4
 
+# Keys read through Controls (recorded and replayed), plus the mouse
+INPUT_KEYS = (pyxel.KEY_Q, pyxel.KEY_LEFT, pyxel.KEY_RIGHT, pyxel.KEY_RETURN, pyxel.MOUSE_BUTTON_LEFT)
+# Methods timed by the profiler (python DungeonSlice.py --profile)
+PROFILE_PHASES = ("update_enemies", "steer_enemies", "collect_dots", "spawn_dots",
+                  "move_projectiles", "draw_player")
+
+# Collisions
+HASH_CELL = 16      # Spatial hash cell size in pixels
+HIT_RANGE = 12      # Projectile to enemy centre, per axis
+CONTACT_RANGE = 10  # Enemy to player distance that hurts
+
+# XP dots: at most one per tile, at the tile centre
+DOT_CHANCE = 0.12   # Chance per tile on each respawn
+DOT_MIN = 5         # Respawn when fewer dots than this are left
+PICKUP_RANGE = 10   # Player centre to dot distance
+
+# Pool capacities; spawns beyond them are dropped
+PROJECTILE_CAP = 256
+ENEMY_CAP = 1024
+
+# Horde mode (python DungeonSlice.py --horde)
+HORDE_CAP = 16384    # Enemy pool capacity in horde mode
+HORDE_GROWTH = 25    # Each 60-tick wave spawns this many more than the last
+VECTOR_THRESHOLD = 256  # Live enemies before steering switches to NumPy
+SEPARATION_CELL = 4     # Separation grid cell size in pixels
+SEPARATION_ROOM = 2     # Neighbours (3x3 cells) per seek step of push
+SEPARATION_MAX = 6      # Most push per tick, in multiples of the enemy's speed
+SEPARATION_NUDGE = 0.5  # Per-slot sideways share of the push direction
+GOLDEN_ANGLE = 2.399963  # Math: spreads stacked enemies' push directions evenly
+PILE_LIMIT = 16         # Most enemies one pixel may hold before check() complains
+
 # =====================
 # CHARACTER DATA
 # =====================
@@ -43,8 +86,99 @@ PROJECTILE_SPRITES = {
     "Wizard": {"right": (16,96), "left": (0,96), "up": (48,96), "down": (32,96), "down-left": (64,96), "down-right": (80,96), "up-left": (96,96), "up-right": (112,96)}
 }
 
+# =====================
+# SPATIAL HASH
+# =====================
+class SpatialHash:
+    """Uniform grid of HASH_CELL pixel buckets, rebuilt every frame"""
+    def __init__(self, cell=HASH_CELL):
+        self.cell = cell
+        self.buckets = {}
+
+    def clear(self):
+        """Empty every bucket, keeping the lists for the next frame"""
+        for bucket in self.buckets.values():
+            bucket.clear()
+
+    def insert(self, x, y, item):
+        key = (int(x // self.cell), int(y // self.cell))
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = [item]
+        else:
+            bucket.append(item)
+
+    def query(self, x0, y0, x1, y1):
+        """Buckets of every cell overlapping the rectangle (x0, y0)-(x1, y1)"""
+        cell = self.cell
+        for cy in range(int(y0 // cell), int(y1 // cell) + 1):
+            for cx in range(int(x0 // cell), int(x1 // cell) + 1):
+                bucket = self.buckets.get((cx, cy))
+                if bucket:
+                    yield bucket
+
+# =====================
+# POOLS
+# =====================
+class Pool:
+    """Fixed-capacity records stored column-wise, slots reused through a free list.
+
+    Slot i of every column belongs to one record and alive[i] says whether
+    it's in use, so spawning and culling never allocate.
+    """
+    COLUMNS = {}  # name -> array typecode
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        for name, code in self.COLUMNS.items():
+            setattr(self, name, array(code, [0]) * capacity)
+        self.alive = bytearray(capacity)
+        self.clear()
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def clear(self):
+        self.alive[:] = bytes(self.capacity)
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.top = 0  # One past the highest slot handed out
+
+    def acquire(self):
+        """Take a free slot (the most recently freed first), or None if full"""
+        if not self.free:
+            return None
+        i = self.free.pop()
+        self.alive[i] = 1
+        if i >= self.top:
+            self.top = i + 1
+        return i
+
+    def release(self, i):
+        self.alive[i] = 0
+        self.free.append(i)
+
+    def views(self):
+        """NumPy arrays sharing memory with every column and `alive`"""
+        views = {name: np.frombuffer(getattr(self, name), dtype=code) for name, code in self.COLUMNS.items()}
+        views["alive"] = np.frombuffer(self.alive, dtype=bool)
+        return views
+
+    def slots(self):
+        """Slots in use, in slot order (safe to release the current one)"""
+        alive = self.alive
+        i = alive.find(1, 0, self.top)
+        while i != -1:
+            yield i
+            i = alive.find(1, i + 1, self.top)
+
+class ProjectilePool(Pool):
+    COLUMNS = {"x": "d", "y": "d", "dx": "d", "dy": "d", "u": "h", "v": "h"}
+
+class EnemyPool(Pool):
+    COLUMNS = {"x": "d", "y": "d", "hp": "i", "speed": "d", "u": "h", "v": "h"}
+
 class App:
-    def __init__(self):
+    def __init__(self, horde=False, controls=None, profiler=None):
         pyxel.init(WIDTH_TILES*TILE, HEIGHT_TILES*TILE, title="Roguelite")
         try:
             pyxel.load("DungeonSlice.pyxres")
@@ -52,18 +186,32 @@ class App:
             pass 
         pyxel.mouse(True)
 
+        # Spawns draw from one seeded RNG so sessions can be replayed
+        self.controls = controls or Controls(INPUT_KEYS, mouse=True)
+        self.rng = random.Random(self.controls.seed)
+
         self.state = STATE_SELECT
         self.selected = 0
         self.character = None
         self.player = {}
-        self.projectiles = []
-        self.dots = set()
-        self.enemies = []
-        self.tick = 0
+        self.projectiles = ProjectilePool(PROJECTILE_CAP)
+        self.dot_grid = bytearray(WIDTH_TILES * HEIGHT_TILES)
+        self.dot_count = 0
+        self.horde = horde
+        self.wave = 0
+        self.enemies = EnemyPool(HORDE_CAP if horde else ENEMY_CAP)
+        self.enemy_views = self.enemies.views() if np is not None else None
+        self.timers = TimerWheel()
+        self.projectile_hash = SpatialHash()
+        self.enemy_hash = SpatialHash()
         self.joy_dx = 0
         self.joy_dy = 0
 
-        pyxel.run(self.update, self.draw)
+        if profiler is not None:
+            profiler.attach(self, PROFILE_PHASES)
+        # Game time runs in fixed ticks, whatever the frame rate
+        self.loop = FixedStep(self.update, self.draw, self.controls.sample)
+        self.loop.run()
 
     def start_game(self):
         self.character = CHARACTERS[self.selected]
@@ -72,60 +220,241 @@ class App:
             "hp": 10, "max_hp": 10, "atk": 1, "level": 1,
             "xp": 0, "xp_need": 10, "moving": False, "anim": 0,
         }
-        self.projectiles = []
-        self.enemies = []
-        self.tick = 0
-        self.dots = self.spawn_dots()
+        self.projectiles.clear()
+        self.enemies.clear()
+        # Spawn and fire cadences run off the timer wheel
+        self.timers = TimerWheel()
+        self.wave = 0
+        self.timers.every(60, self.spawn_wave if self.horde else self.spawn_enemy)
+        self.timers.every(25, self.fire_projectile)
+        self.dot_grid = bytearray(WIDTH_TILES * HEIGHT_TILES)
+        self.spawn_dots()
         self.state = STATE_PLAY
 
     def spawn_dots(self):
-        return {(x*TILE+4, y*TILE+4) for y in range(HEIGHT_TILES) for x in range(WIDTH_TILES) if random.random() < 0.12}
+        """Scatter XP dots over the dot grid in one bulk pass"""
+        grid = self.dot_grid
+        for i in range(len(grid)):
+            if self.rng.random() < DOT_CHANCE:
+                grid[i] = 1
+        self.dot_count = grid.count(1)
+
+    def collect_dots(self):
+        """Pick up dots in the few tiles under the player"""
+        cx, cy = self.player["x"] + 8, self.player["y"] + 8
+        grid = self.dot_grid
+        x0 = max(0, int(cx - PICKUP_RANGE - 4) // TILE)
+        x1 = min(WIDTH_TILES - 1, int(cx + PICKUP_RANGE - 4) // TILE + 1)
+        y0 = max(0, int(cy - PICKUP_RANGE - 4) // TILE)
+        y1 = min(HEIGHT_TILES - 1, int(cy + PICKUP_RANGE - 4) // TILE + 1)
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                i = y * WIDTH_TILES + x
+                if not grid[i]:
+                    continue
+                dx, dy = cx - (x*TILE+4), cy - (y*TILE+4)
+                if dx*dx + dy*dy < PICKUP_RANGE * PICKUP_RANGE:
+                    grid[i] = 0
+                    self.dot_count -= 1
+                    self.player["xp"] += 1
 
     def spawn_enemy(self):
-        side = random.randint(0, 3)
-        if side == 0: x, y = random.randint(0, pyxel.width), -16
-        elif side == 1: x, y = random.randint(0, pyxel.width), pyxel.height
-        elif side == 2: x, y = -16, random.randint(0, pyxel.height)
-        else: x, y = pyxel.width, random.randint(0, pyxel.height)
+        side = self.rng.randint(0, 3)
+        if side == 0: x, y = self.rng.randint(0, pyxel.width), -16
+        elif side == 1: x, y = self.rng.randint(0, pyxel.width), pyxel.height
+        elif side == 2: x, y = -16, self.rng.randint(0, pyxel.height)
+        else: x, y = pyxel.width, self.rng.randint(0, pyxel.height)
         
-        is_cobra = random.random() > 0.5
+        is_cobra = self.rng.random() > 0.5
         u = 16 if is_cobra else 32
         
-        self.enemies.append({
-            "x": x, "y": y, 
-            "hp": 2 if is_cobra else 5, 
-            "u": u, "v": 112, 
-            "speed": 0.8 if is_cobra else 0.4
-        })
+        e = self.enemies.acquire()
+        if e is None:
+            return
+        enemies = self.enemies
+        enemies.x[e], enemies.y[e] = x, y
+        enemies.hp[e] = 2 if is_cobra else 5
+        enemies.u[e], enemies.v[e] = u, 112
+        enemies.speed[e] = 0.8 if is_cobra else 0.4
 
-    def update_enemies(self):
-        if self.tick % 60 == 0:
+    def spawn_wave(self):
+        """Horde mode: every wave is HORDE_GROWTH enemies bigger than the last"""
+        self.wave += 1
+        for _ in range(self.wave * HORDE_GROWTH):
             self.spawn_enemy()
 
-        for e in self.enemies:
+    def update_enemies(self):
+        enemies, projectiles = self.enemies, self.projectiles
+        ex, ey, speed, hp = enemies.x, enemies.y, enemies.speed, enemies.hp
+        qx, qy = projectiles.x, projectiles.y
+        player_x, player_y = self.player["x"], self.player["y"]
+
+        # Bucket projectiles once; each enemy only tests the cells around it
+        projectile_hash = self.projectile_hash
+        projectile_hash.clear()
+        for p in projectiles.slots():
+            projectile_hash.insert(qx[p], qy[p], p)
+
+        for e in enemies.slots():
             # Move toward player
-            dx = self.player["x"] - e["x"]
-            dy = self.player["y"] - e["y"]
+            dx = player_x - ex[e]
+            dy = player_y - ey[e]
             dist = math.sqrt(dx*dx + dy*dy)
             if dist > 0:
-                e["x"] += (dx/dist) * e["speed"]
-                e["y"] += (dy/dist) * e["speed"]
-
-            # Enemy hits Player
-            if dist < 10:
-                self.player["hp"] -= 0.05 # Rapid damage on contact
-                if self.player["hp"] <= 0:
-                    self.state = STATE_GAMEOVER
-
-            # Projectile hits Enemy
-            for p in self.projectiles:
-                if abs(p["x"] - (e["x"]+4)) < 12 and abs(p["y"] - (e["y"]+4)) < 12:
-                    e["hp"] -= self.player["atk"]
-                    if p in self.projectiles:
-                        self.projectiles.remove(p)
-                    break
+                ex[e] += (dx/dist) * speed[e]
+                ey[e] += (dy/dist) * speed[e]
+
+            # Projectile hits Enemy (the lowest live slot in range)
+            cx, cy = ex[e] + 4, ey[e] + 4
+            hit = None
+            for bucket in projectile_hash.query(cx - HIT_RANGE, cy - HIT_RANGE, cx + HIT_RANGE, cy + HIT_RANGE):
+                for p in bucket:
+                    if hit is not None and p >= hit:
+                        break
+                    if projectiles.alive[p] and abs(qx[p] - cx) < HIT_RANGE and abs(qy[p] - cy) < HIT_RANGE:
+                        hit = p
+                        break
+            if hit is not None:
+                hp[e] -= self.player["atk"]
+                projectiles.release(hit)
+                if hp[e] <= 0:
+                    enemies.release(e)
+
+        # Enemy hits Player: only enemies bucketed near the player
+        enemy_hash = self.enemy_hash
+        enemy_hash.clear()
+        for e in enemies.slots():
+            enemy_hash.insert(ex[e], ey[e], e)
+        for bucket in enemy_hash.query(player_x - CONTACT_RANGE, player_y - CONTACT_RANGE, player_x + CONTACT_RANGE, player_y + CONTACT_RANGE):
+            for e in bucket:
+                dx, dy = player_x - ex[e], player_y - ey[e]
+                if dx*dx + dy*dy < CONTACT_RANGE * CONTACT_RANGE:
+                    self.player["hp"] -= 0.05 # Rapid damage on contact
+                    if self.player["hp"] <= 0:
+                        self.state = STATE_GAMEOVER
+
+    def grid_shape(self, cell=HASH_CELL):
+        """Math: (margin, cols, rows) of a grid of `cell`-pixel cells over the
+        screen plus a margin of two hash cells for enemies still walking in
+        from off-screen"""
+        margin = 2 * HASH_CELL // cell
+        return margin, WIDTH_TILES*TILE // cell + 2*margin + 1, HEIGHT_TILES*TILE // cell + 2*margin + 1
+
+    def cell_keys(self, x, y, cell=HASH_CELL):
+        """Math: flat grid cell index of each (x, y) for `cell`-pixel cells
+        (SpatialHash cells by default), see grid_shape"""
+        margin, cols, rows = self.grid_shape(cell)
+        gx = np.clip(np.floor_divide(x, cell).astype(np.int64) + margin, 0, cols - 1)
+        gy = np.clip(np.floor_divide(y, cell).astype(np.int64) + margin, 0, rows - 1)
+        return gy * cols + gx, cols
+
+    def box_sum(self, grid, cols):
+        """Math: every cell of a flat grid `cols` wide summed with its 8
+        neighbours (edges padded with zeros)"""
+        grid = np.pad(grid.reshape(-1, cols), 1)
+        box = sum(grid[dy:dy + grid.shape[0] - 2, dx:dx + grid.shape[1] - 2]
+                  for dy in range(3) for dx in range(3))
+        return box.ravel()
+
+    def steer_enemies(self):
+        """update_enemies for big hordes: every enemy moves in one NumPy step.
+
+        Enemies seek the player and are pushed out from the centre of their
+        crowded separation cell, harder the more neighbours share it and
+        never weaker than their own seek step, so a pile can't keep growing
+        on one pixel; contact damage is one vectorized distance mask.
+        """
+        enemies, projectiles = self.enemies, self.projectiles
+        views = self.enemy_views
+        live = np.flatnonzero(views["alive"][:enemies.top])
+        player_x, player_y = self.player["x"], self.player["y"]
+        x = views["x"][live]
+        y = views["y"][live]
+
+        # Seek
+        speed = views["speed"][live]
+        dx = player_x - x
+        dy = player_y - y
+        dist = np.hypot(dx, dy)
+        scale = np.divide(speed, dist, out=np.zeros_like(dist), where=dist > 0)
+        vx = dx * scale
+        vy = dy * scale
+
+        # Separation: away from the centroid of the neighbours in the 3x3
+        # cells around each enemy, one seek step for every SEPARATION_ROOM
+        # neighbours but never less than one step, up to SEPARATION_MAX.
+        # A per-slot nudge makes enemies on the same pixel part ways.
+        key, cols = self.cell_keys(x + 4, y + 4, SEPARATION_CELL)
+        _, _, rows = self.grid_shape(SEPARATION_CELL)
+        size = cols * rows
+        count = self.box_sum(np.bincount(key, minlength=size), cols)[key]
+        ox = x - self.box_sum(np.bincount(key, weights=x, minlength=size), cols)[key] / count
+        oy = y - self.box_sum(np.bincount(key, weights=y, minlength=size), cols)[key] / count
+        crowded = count > 1
+        spread = np.hypot(ox, oy)
+        ox = np.divide(ox, spread, out=np.zeros_like(ox), where=spread > 1e-6)
+        oy = np.divide(oy, spread, out=np.zeros_like(oy), where=spread > 1e-6)
+        angle = live * GOLDEN_ANGLE
+        ox += SEPARATION_NUDGE * np.cos(angle)
+        oy += SEPARATION_NUDGE * np.sin(angle)
+        strength = speed * np.clip((count - 1) / SEPARATION_ROOM, 1, SEPARATION_MAX)
+        push = np.divide(strength, np.hypot(ox, oy), out=np.zeros_like(strength), where=crowded)
+        x += vx + ox * push
+        y += vy + oy * push
+        views["x"][live] = x
+        views["y"][live] = y
+
+        # Enemy hits Player: every enemy within CONTACT_RANGE
+        dx = player_x - x
+        dy = player_y - y
+        contacts = np.count_nonzero(dx*dx + dy*dy < CONTACT_RANGE * CONTACT_RANGE)
+        if contacts:
+            self.player["hp"] -= 0.05 * contacts # Rapid damage on contact
+            if self.player["hp"] <= 0:
+                self.state = STATE_GAMEOVER
+
+        if len(projectiles):
+            self.hit_enemies(live, x + 4, y + 4)
+
+    def hit_enemies(self, live, cx, cy):
+        """Projectile hits for steer_enemies.
+
+        Enemies are sorted by hash cell once; each projectile (slot order)
+        hits the lowest live enemy slot in the cells around it that hasn't
+        been hit this frame.
+        """
+        enemies, projectiles = self.enemies, self.projectiles
+        key, cols = self.cell_keys(cx, cy)
+        order = np.argsort(key, kind="stable")
+        sorted_keys = key[order]
+        
+        # The 3x3 cells every projectile's hit box can overlap, all looked
+        # up in one searchsorted call
+        shots = list(projectiles.slots())
+        qx = np.array([projectiles.x[p] for p in shots])
+        qy = np.array([projectiles.y[p] for p in shots])
+        near, _ = self.cell_keys(qx - HIT_RANGE, qy - HIT_RANGE)
+        around = np.array([dy * cols + dx for dy in range(3) for dx in range(3)])
+        cells = (near[:, None] + around).ravel()
+        lo = np.searchsorted(sorted_keys, cells, "left").reshape(-1, 9)
+        hi = np.searchsorted(sorted_keys, cells, "right").reshape(-1, 9)
+        
+        hit = np.zeros(len(live), dtype=bool)
+        for n, p in enumerate(shots):
+            if not (hi[n] > lo[n]).any():
+                continue
+            c = np.concatenate([order[a:b] for a, b in zip(lo[n], hi[n])])
+            c = c[~hit[c] & (np.abs(cx[c] - qx[n]) < HIT_RANGE) & (np.abs(cy[c] - qy[n]) < HIT_RANGE)]
+            if c.size:
+                hit[c.min()] = True
+                projectiles.release(p)
         
-        self.enemies = [e for e in self.enemies if e["hp"] > 0]
+        if hit.any():
+            slots = live[hit]
+            hp = self.enemy_views["hp"]
+            hp[slots] -= self.player["atk"]
+            for e in slots[hp[slots] <= 0].tolist():
+                enemies.release(e)
 
     def level_up(self):
         self.player["level"] += 1
@@ -137,12 +466,18 @@ class App:
         dir = self.player["dir"]
         dx, dy = DIR_VEL[dir]
         u, v = PROJECTILE_SPRITES[self.character["name"]][dir]
-        self.projectiles.append({"x": self.player["x"] + 4, "y": self.player["y"] + 4, "dx": dx, "dy": dy, "u": u, "v": v})
+        p = self.projectiles.acquire()
+        if p is None:
+            return
+        projectiles = self.projectiles
+        projectiles.x[p], projectiles.y[p] = self.player["x"] + 4, self.player["y"] + 4
+        projectiles.dx[p], projectiles.dy[p] = dx, dy
+        projectiles.u[p], projectiles.v[p] = u, v
 
     def joystick_direction(self):
         self.joy_dx = self.joy_dy = 0
-        if not pyxel.btn(pyxel.MOUSE_BUTTON_LEFT): return None
-        mx, my = pyxel.mouse_x, pyxel.mouse_y
+        if not self.controls.btn(pyxel.MOUSE_BUTTON_LEFT): return None
+        mx, my = self.controls.mouse_x, self.controls.mouse_y
         dx, dy = mx - JOY_CENTER_X, my - JOY_CENTER_Y
         dist = math.sqrt(dx*dx + dy*dy)
         if dist == 0: return None
@@ -158,15 +493,19 @@ class App:
         return "right"
 
     def update(self):
-        if pyxel.btnp(pyxel.KEY_Q): pyxel.quit()
+        controls = self.controls
+        controls.poll()
+        if controls.btnp(pyxel.KEY_Q):
+            controls.close()
+            pyxel.quit()
         if self.state == STATE_SELECT:
-            if pyxel.btnp(pyxel.KEY_LEFT): self.selected = (self.selected - 1) % len(CHARACTERS)
-            if pyxel.btnp(pyxel.KEY_RIGHT): self.selected = (self.selected + 1) % len(CHARACTERS)
-            if pyxel.btnp(pyxel.KEY_RETURN): self.start_game()
+            if controls.btnp(pyxel.KEY_LEFT): self.selected = (self.selected - 1) % len(CHARACTERS)
+            if controls.btnp(pyxel.KEY_RIGHT): self.selected = (self.selected + 1) % len(CHARACTERS)
+            if controls.btnp(pyxel.KEY_RETURN): self.start_game()
         elif self.state == STATE_PLAY:
             self.update_game()
         elif self.state == STATE_GAMEOVER:
-            if pyxel.btnp(pyxel.KEY_RETURN): self.state = STATE_SELECT
+            if controls.btnp(pyxel.KEY_RETURN): self.state = STATE_SELECT
 
     def update_game(self):
         dir = self.joystick_direction()
@@ -180,25 +519,51 @@ class App:
 
         self.player["x"] = max(0, min(self.player["x"], WIDTH_TILES*TILE-CHAR_SIZE))
         self.player["y"] = max(0, min(self.player["y"], HEIGHT_TILES*TILE-CHAR_SIZE))
-        self.player["anim"] = (pyxel.frame_count//8)%2 if self.player["moving"] else 0
-        self.tick += 1
+        self.player["anim"] = (self.timers.now//8)%2 if self.player["moving"] else 0
+        self.timers.advance()
         
-        self.update_enemies()
+        if np is not None and len(self.enemies) >= VECTOR_THRESHOLD:
+            self.steer_enemies()
+        else:
+            self.update_enemies()
 
         # XP Collection
-        collected = [d for d in self.dots if math.sqrt((self.player["x"]+8-d[0])**2 + (self.player["y"]+8-d[1])**2) < 10]
-        for d in collected:
-            self.dots.remove(d)
-            self.player["xp"] += 1
-        if len(self.dots) < 5: self.dots.update(self.spawn_dots())
+        self.collect_dots()
+        if self.dot_count < DOT_MIN: self.spawn_dots()
         
         if self.player["xp"] >= self.player["xp_need"]: self.level_up()
-        if self.tick % 25 == 0: self.fire_projectile()
+        self.move_projectiles()
+
+    def move_projectiles(self):
+        # Off-screen projectiles give their slot back
+        projectiles = self.projectiles
+        qx, qy = projectiles.x, projectiles.y
+        for p in projectiles.slots():
+            qx[p] += projectiles.dx[p]
+            qy[p] += projectiles.dy[p]
+            if not (0 <= qx[p] <= WIDTH_TILES*TILE and 0 <= qy[p] <= HEIGHT_TILES*TILE):
+                projectiles.release(p)
+
+    def entity_counts(self):
+        """Live entities, for the profiler"""
+        counts = {"enemies": len(self.enemies), "projectiles": len(self.projectiles), "dots": self.dot_count}
+        if self.horde:
+            counts["largest pile"] = self.largest_pile()
+        return counts
+
+    def largest_pile(self):
+        """Most live enemies sharing one (rounded) pixel"""
+        enemies = self.enemies
+        piles = Counter((round(enemies.x[e]), round(enemies.y[e])) for e in enemies.slots())
+        return max(piles.values(), default=0)
 
-        for p in self.projectiles:
-            p["x"] += p["dx"]
-            p["y"] += p["dy"]
-        self.projectiles = [p for p in self.projectiles if 0 <= p["x"] <= WIDTH_TILES*TILE and 0 <= p["y"] <= HEIGHT_TILES*TILE]
+    def check(self):
+        """Problems a headless run should fail on (python Headless.py
+        DungeonSlice 5000 --horde): a horde collapsing onto a few pixels"""
+        pile = self.largest_pile()
+        if pile > PILE_LIMIT:
+            return [f"{pile} enemies share one pixel (limit {PILE_LIMIT})"]
+        return []
 
     def draw(self):
         pyxel.cls(0)
@@ -213,9 +578,13 @@ class App:
         
         elif self.state == STATE_PLAY:
             pyxel.bltm(0, 0, 0, 0, 0, WIDTH_TILES*TILE, HEIGHT_TILES*TILE)
-            for d in self.dots: pyxel.circ(d[0], d[1], 1, 11)
-            for e in self.enemies: pyxel.blt(e["x"], e["y"], 0, e["u"], e["v"], 16, 16, 0)
-            for p in self.projectiles: pyxel.blt(p["x"], p["y"], 0, p["u"], p["v"], 16, 16, 0)
+            i = self.dot_grid.find(1)
+            while i != -1:
+                pyxel.circ(i % WIDTH_TILES * TILE + 4, i // WIDTH_TILES * TILE + 4, 1, 11)
+                i = self.dot_grid.find(1, i + 1)
+            enemies, projectiles = self.enemies, self.projectiles
+            for e in enemies.slots(): pyxel.blt(enemies.x[e], enemies.y[e], 0, enemies.u[e], enemies.v[e], 16, 16, 0)
+            for p in projectiles.slots(): pyxel.blt(projectiles.x[p], projectiles.y[p], 0, projectiles.u[p], projectiles.v[p], 16, 16, 0)
             
             # UI
             pyxel.rect(5, 5, 50, 6, 0)
@@ -245,4 +614,7 @@ class App:
         ky = JOY_CENTER_Y + int(self.joy_dy * (JOY_RADIUS - 5))
         pyxel.circb(kx, ky, JOY_KNOB_RADIUS, 10)
 
-App()
\ No newline at end of file
+if __name__ == "__main__":
+    App(horde="--horde" in sys.argv,
+        controls=Controls.from_argv(sys.argv, INPUT_KEYS, mouse=True),
+        profiler=Profiler.from_argv(sys.argv))
@@ -0,0 +1,98 @@
+# =====================
+# FIXED TIMESTEP LOOP
+# =====================
+# Sits between pyxel.run and a game's update/draw so game time advances in
+# fixed simulation ticks regardless of how long frames take to render.
+# Real time piles up in an accumulator and each pyxel frame runs as many
+# ticks as it covers: none if the frame came early, several if rendering
+# fell behind. Catch-up is capped at MAX_STEPS ticks per frame, beyond
+# which the backlog is dropped so a slow machine runs slower instead of
+# spiralling. A frame that needed BEHIND_STEPS ticks or more is falling
+# behind rather than jittering, so its draw is skipped (at most MAX_SKIPPED
+# in a row) to hand the time back to the simulation.
+#
+# Everything in the games (timers, animation) counts ticks, never pyxel
+# frames, so gameplay speed doesn't depend on the render rate. Input edges
+# (btnp) are pyxel frame events, though: `sample` runs once every pyxel
+# frame, before its ticks, so a press on a frame that runs no tick is
+# latched for the next one instead of lost.
+
+import time
+
+import pyxel
+
+SIM_RATE = 30      # Simulation ticks per second, what the games are tuned for
+MAX_STEPS = 4      # Most ticks run for one rendered frame
+BEHIND_STEPS = 3   # Ticks in one frame that mean rendering is falling behind
+MAX_SKIPPED = 2    # Most draws skipped in a row while catching up
+
+
+class FixedStep:
+    def __init__(self, update, draw, sample=None, rate=SIM_RATE, max_steps=MAX_STEPS,
+                 behind_steps=BEHIND_STEPS, max_skipped=MAX_SKIPPED,
+                 clock=time.perf_counter_ns):
+        self.sim_update = update
+        self.sim_draw = draw
+        self.sample = sample
+        self.step_ns = 1_000_000_000 // rate
+        self.max_steps = max_steps
+        self.behind_steps = behind_steps
+        self.max_skipped = max_skipped
+        self.clock = clock
+        self.last = None
+        self.accumulator = 0
+        self.steps = 0     # Ticks run for the current frame
+        self.ticks = 0     # Ticks run in total
+        self.skipped = 0   # Draws skipped in a row
+        self.dropped = 0   # Ticks given up on because catch-up was capped
+        self.drawn = False
+
+    def update(self):
+        """pyxel update callback: run the ticks real time has paid for"""
+        now = self.clock()
+        if self.last is None:
+            # First frame: one tick, whatever startup took
+            self.last = now
+            self.accumulator = self.step_ns
+        self.accumulator += now - self.last
+        self.last = now
+        if self.sample is not None:
+            self.sample()
+
+        steps = 0
+        while self.accumulator >= self.step_ns and steps < self.max_steps:
+            self.sim_update()
+            self.accumulator -= self.step_ns
+            steps += 1
+        if self.accumulator >= self.step_ns:
+            # Still behind after the cap: drop the backlog
+            self.dropped += self.accumulator // self.step_ns
+            self.accumulator %= self.step_ns
+        self.steps = steps
+        self.ticks += steps
+
+    def draw(self):
+        """pyxel draw callback: redraw unless nothing changed, or we're
+        behind and haven't skipped too many draws in a row already"""
+        if self.drawn:
+            # pyxel keeps showing the last frame drawn
+            if self.steps == 0:
+                return
+            if self.steps >= self.behind_steps and self.skipped < self.max_skipped:
+                self.skipped += 1
+                return
+        self.sim_draw()
+        self.drawn = True
+        self.skipped = 0
+
+    def step(self):
+        """One frame of exactly one tick, for headless drivers"""
+        self.sample()
+        self.sim_update()
+
+    def run(self):
+        if getattr(pyxel, "headless", False):
+            # Headless drivers step the simulation themselves, one tick per call
+            pyxel.run(self.step if self.sample is not None else self.sim_update, self.sim_draw)
+        else:
+            pyxel.run(self.update, self.draw)
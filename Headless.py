@@ -0,0 +1,322 @@
+# =====================
+# HEADLESS PYXEL
+# =====================
+# Drop-in stand-in for the parts of pyxel the games use, with no window,
+# sound or GPU. install() registers this module as `pyxel`, so a game
+# imported afterwards draws into counters instead of a screen and run()
+# hands its update/draw pair back to us. drive() then steps them as fast
+# as the CPU allows and reports ticks per second and draw calls per frame.
+#
+#   python Headless.py Dungeon 5000
+#   python Headless.py Dungeon 5000 --store
+#   python Headless.py Pacman 5000 --stress
+#   python Headless.py DungeonSlice 5000 --horde
+#   python Headless.py Pacman 0 --replay session.pxin   (0: the whole log)
+#
+# --record FILE and --replay FILE go through Controls, see Controls.py;
+# --profile [FILE] prints per-phase timings, see Profiler.py. A game with a
+# check() method is asked for problems afterwards; any of them fail the run.
+
+import importlib
+import random
+import sys
+import time
+from collections import Counter
+
+# Key codes match pyxel's, so input recorded in one backend replays in the other
+KEY_BACKSPACE = 0x08
+KEY_TAB = 0x09
+KEY_RETURN = 0x0D
+KEY_ESCAPE = 0x1B
+KEY_SPACE = 0x20
+for _i in range(10):
+    globals()[f"KEY_{_i}"] = 0x30 + _i
+for _i in range(26):
+    globals()[f"KEY_{chr(65 + _i)}"] = 0x61 + _i
+for _i in range(12):
+    globals()[f"KEY_F{_i + 1}"] = 0x4000003A + _i
+KEY_RIGHT = 0x4000004F
+KEY_LEFT = 0x40000050
+KEY_DOWN = 0x40000051
+KEY_UP = 0x40000052
+MOUSE_BUTTON_LEFT = 0x50000104
+MOUSE_BUTTON_MIDDLE = 0x50000105
+MOUSE_BUTTON_RIGHT = 0x50000106
+
+# Keys random_input may press; never KEY_Q, which quits most games
+PLAY_KEYS = (KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT, KEY_SPACE, KEY_Z,
+             KEY_RETURN, MOUSE_BUTTON_LEFT)
+
+# Game module -> constructor, given the module, command line, Controls and
+# Profiler (or None)
+GAMES = {
+    "Dungeon": lambda m, argv, controls, profiler: m.Game(
+        controls=controls, profiler=profiler, enemy_store="--store" in argv),
+    "Pacman": lambda m, argv, controls, profiler: m.App(
+        m.STRESS_GHOSTS if "--stress" in argv else m.NUM_GHOSTS, controls, profiler),
+    "DungeonSlice": lambda m, argv, controls, profiler: m.App("--horde" in argv, controls, profiler),
+}
+MOUSE_GAMES = {"DungeonSlice"}
+
+TILEMAP_SIZE = 256
+IMAGE_SIZE = 256
+
+# =====================
+# STATE
+# =====================
+width = 0
+height = 0
+frame_count = 0
+mouse_x = 0
+mouse_y = 0
+app = None  # (update, draw) given to run()
+headless = True  # FixedStep hands us the raw update/draw, one tick per step
+
+held = frozenset()       # Keys down this frame
+last_held = frozenset()  # Keys down last frame, for btnp
+
+calls = Counter()        # Draw calls this frame
+totals = Counter()       # Draw calls since reset()
+peaks = Counter()        # Most calls of each kind in a single frame
+
+
+class Quit(Exception):
+    """Raised by quit() so a driver can stop instead of exiting"""
+
+
+def reset():
+    global frame_count, mouse_x, mouse_y, app, held, last_held
+    frame_count = mouse_x = mouse_y = 0
+    app = None
+    held = last_held = frozenset()
+    calls.clear()
+    totals.clear()
+    peaks.clear()
+
+
+def install():
+    """Make `import pyxel` return this module from now on"""
+    sys.modules["pyxel"] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+# =====================
+# RESOURCES
+# =====================
+def _count(name):
+    def call(*args, **kwargs):
+        calls[name] += 1
+    call.__name__ = name
+    return call
+
+
+class Image:
+    def __init__(self, w, h):
+        self.width = w
+        self.height = h
+        self.pixels = {}
+
+    def pset(self, x, y, col):
+        self.pixels[(x, y)] = col
+
+    def pget(self, x, y):
+        return self.pixels.get((x, y), 0)
+
+    def __getattr__(self, name):
+        # cls, rect, blt, ... on an offscreen image count like screen calls
+        return _count("image." + name)
+
+
+class Tilemap:
+    def __init__(self, w, h, img):
+        self.width = w
+        self.height = h
+        self.imgsrc = img
+        self.tiles = {}
+
+    def pset(self, x, y, tile):
+        self.tiles[(x, y)] = tile
+
+    def pget(self, x, y):
+        return self.tiles.get((x, y), (0, 0))
+
+
+class Sound:
+    def set(self, notes, tones, volumes, effects, speed):
+        self.notes = notes
+        self.speed = speed
+
+
+class Music:
+    def set(self, *seqs):
+        self.seqs = seqs
+
+
+images = [Image(IMAGE_SIZE, IMAGE_SIZE) for _ in range(3)]
+tilemaps = [Tilemap(TILEMAP_SIZE, TILEMAP_SIZE, i) for i in range(8)]
+sounds = [Sound() for _ in range(64)]
+musics = [Music() for _ in range(8)]
+
+
+# =====================
+# SYSTEM
+# =====================
+def init(w, h, **kwargs):
+    global width, height
+    width, height = w, h
+
+
+def load(filename, **kwargs):
+    pass
+
+
+def run(update, draw):
+    """Hand the callbacks to the driver instead of opening a window"""
+    global app
+    app = (update, draw)
+
+
+def quit():
+    raise Quit
+
+
+def mouse(visible):
+    pass
+
+
+def btn(key):
+    return key in held
+
+
+def btnp(key, hold=0, repeat=0):
+    return key in held and key not in last_held
+
+
+def btnr(key):
+    return key in last_held and key not in held
+
+
+# =====================
+# DRAWING
+# =====================
+cls = _count("cls")
+camera = _count("camera")
+clip = _count("clip")
+pal = _count("pal")
+dither = _count("dither")
+pset = _count("pset")
+line = _count("line")
+rect = _count("rect")
+rectb = _count("rectb")
+circ = _count("circ")
+circb = _count("circb")
+tri = _count("tri")
+blt = _count("blt")
+bltm = _count("bltm")
+text = _count("text")
+play = _count("play")
+playm = _count("playm")
+stop = _count("stop")
+
+
+# =====================
+# DRIVER
+# =====================
+def random_input(seed=0, keys=PLAY_KEYS, hold=8):
+    """Input function pressing one random key, changing every `hold` frames"""
+    rng = random.Random(seed)
+    pressed = [frozenset()]
+
+    def keys_at(frame):
+        global mouse_x, mouse_y
+        if frame % hold == 0:
+            pressed[0] = frozenset((rng.choice(keys),))
+            mouse_x, mouse_y = rng.randrange(max(1, width)), rng.randrange(max(1, height))
+        return pressed[0]
+    return keys_at
+
+
+def step(update, draw, keys=frozenset()):
+    """Run one frame with `keys` held"""
+    global frame_count, held, last_held
+    last_held, held = held, frozenset(keys)
+    calls.clear()
+    update()
+    draw()
+    for name, n in calls.items():
+        totals[name] += n
+        if n > peaks[name]:
+            peaks[name] = n
+    frame_count += 1
+
+
+def drive(update=None, draw=None, frames=1000, keys=None):
+    """Step update/draw up to `frames` times, stopping early on quit().
+
+    `keys(frame)` returns the keys held on that frame (and may move the
+    mouse); without it nothing is pressed. Returns the timing and draw-call
+    counts as a dict.
+    """
+    if update is None:
+        update, draw = app
+    done = 0
+    start = time.perf_counter()
+    try:
+        for frame in range(frames):
+            step(update, draw, keys(frame) if keys else ())
+            done += 1
+    except Quit:
+        pass
+    seconds = time.perf_counter() - start
+    return {
+        "frames": done,
+        "seconds": seconds,
+        "ticks_per_second": done / seconds if seconds else 0.0,
+        "calls": dict(totals),
+        "calls_per_frame": {k: v / max(1, done) for k, v in totals.items()},
+        "peak_calls": dict(peaks),
+    }
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in GAMES:
+        print(f"usage: python Headless.py {{{'|'.join(GAMES)}}} [frames] [--seed N] "
+              "[--record FILE | --replay FILE] [game flags]")
+        return 1
+    name = argv[1]
+    frames = int(argv[2]) if len(argv) > 2 and argv[2].isdigit() else 1000
+    seed = int(argv[argv.index("--seed") + 1]) if "--seed" in argv else 0
+
+    install()
+    reset()
+    from Controls import Controls
+    from Profiler import Profiler
+    module = importlib.import_module(name)
+    if "--seed" not in argv and "--replay" not in argv:
+        argv = argv + ["--seed", str(seed)]
+    controls = Controls.from_argv(argv, module.INPUT_KEYS, name in MOUSE_GAMES)
+    if controls.frames is not None:
+        frames = min(frames, controls.frames) if frames else controls.frames
+    profiler = Profiler.from_argv(argv)
+    game = GAMES[name](module, argv, controls, profiler)
+    stats = drive(frames=frames, keys=random_input(seed))
+    controls.close()
+    problems = game.check() if hasattr(game, "check") else []
+
+    print(f"{name}: {stats['frames']} frames in {stats['seconds']:.3f}s, "
+          f"{stats['ticks_per_second']:.0f} ticks/s")
+    for call, per_frame in sorted(stats["calls_per_frame"].items()):
+        print(f"  {call:<14} {per_frame:8.1f}/frame  peak {stats['peak_calls'][call]}")
+    if profiler is not None:
+        profiler.close()
+        print(f"  {'phase':<24} {'mean us':>8} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+        for phase, h in profiler.summary().items():
+            print(f"  {phase:<24} {h['mean_ns'] / 1e3:8.1f} {h['p50_ns'] / 1e3:8.1f} "
+                  f"{h['p99_ns'] / 1e3:8.1f} {h['max_ns'] / 1e3:8.1f}")
+    for problem in problems:
+        print(f"check failed: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,5 +1,12 @@
 import pyxel
 import random
+import sys
+from array import array
+from collections import OrderedDict, deque
+from TimerWheel import TimerWheel
+from Controls import Controls
+from FixedStep import FixedStep
+from Profiler import Profiler
 
 # =====================
 # CONSTANTS
@@ -7,42 +14,132 @@ import random
 TILE = 8
 WIDTH_TILES = 20
 HEIGHT_TILES = 15
-WALL_PROB = 0.1
+LOOP_PROB = 0.3  # Chance to knock out a maze wall that would close a loop
+
+NUM_GHOSTS = 2
+STRESS_GHOSTS = 300  # Ghosts in stress mode (python Pacman.py --stress)
+
+# Keys read through Controls (recorded and replayed)
+INPUT_KEYS = (pyxel.KEY_LEFT, pyxel.KEY_RIGHT, pyxel.KEY_UP, pyxel.KEY_DOWN)
+# Methods timed by the profiler (python Pacman.py --profile)
+PROFILE_PHASES = ("eat", "update_ghosts", "check_ghosts", "draw_maze", "draw_ghosts")
+
+# Ghost modes alternate on these timers (frames at 30 fps)
+SCATTER_TIME = 7 * 30
+CHASE_TIME = 20 * 30
+
+# Tiles of image bank 0 used by the wall layer
+WALL_TILE = (0, 2)   # Wall sprite at 0,16
+BLANK_TILE = (2, 1)  # Empty tile
+
+# Exit bits of a tile, one per direction; (0, 0) needs no exit
+DIR_BITS = {(1,0): 1, (-1,0): 2, (0,1): 4, (0,-1): 8, (0,0): 0}
+# Open directions for every exits bitmask
+EXIT_DIRS = tuple(
+    tuple(d for d, bit in DIR_BITS.items() if bit and mask & bit)
+    for mask in range(16)
+)
+# Straight corridors: nothing to decide there
+CORRIDORS = (1 | 2, 4 | 8)
+# Math: (exit bit, tile index step) for BFS over the exits bitmask
+EXIT_STEPS = ((1, 1), (2, -1), (4, WIDTH_TILES), (8, -WIDTH_TILES))
+
+UNREACHED = 0xFFFF  # Largest 'H' value, so maps are two bytes per tile
+MAP_CACHE = 64  # Distance maps kept per maze
+
+# =====================
+# BITSET
+# =====================
+class Bitset:
+    """Set of tile indices, one bit per tile packed into a bytearray"""
+    def __init__(self, size):
+        self.bits = bytearray((size + 7) >> 3)
+
+    def __contains__(self, i):
+        return self.bits[i >> 3] >> (i & 7) & 1 == 1
+
+    def add(self, i):
+        self.bits[i >> 3] |= 1 << (i & 7)
+
+    def discard(self, i):
+        self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+# =====================
+# DISTANCE MAPS
+# =====================
+class DistanceMaps:
+    """BFS distance maps over the maze, one per target tile.
+
+    Shared by every ghost and cached, so a ghost's choice at a junction is
+    an array lookup; a map is only computed the first time its target is
+    asked for (e.g. when Pac-Man enters a new tile).
+    """
+    def __init__(self, exits):
+        self.exits = exits
+        self.maps = OrderedDict()
+
+    def get(self, target):
+        dist = self.maps.get(target)
+        if dist is None:
+            dist = self.compute(target)
+            self.maps[target] = dist
+            if len(self.maps) > MAP_CACHE:
+                self.maps.popitem(last=False)
+        else:
+            self.maps.move_to_end(target)
+        return dist
+
+    def compute(self, target):
+        exits = self.exits
+        dist = array('H', [UNREACHED]) * len(exits)
+        dist[target] = 0
+        queue = deque([target])
+        while queue:
+            i = queue.popleft()
+            d = dist[i] + 1
+            for bit, step in EXIT_STEPS:
+                n = i + step
+                if exits[i] & bit and dist[n] == UNREACHED:
+                    dist[n] = d
+                    queue.append(n)
+        return dist
 
 # =====================
 # GHOST CLASS
 # =====================
 class Ghost:
-    def __init__(self, x, y):
+    def __init__(self, x, y, home=0, rng=random):
         self.x = x
         self.y = y
-        self.dir_x, self.dir_y = random.choice([(1,0), (-1,0), (0,1), (0,-1)])
+        self.home = home  # Scatter corner
+        self.dir_x, self.dir_y = rng.choice([(1,0), (-1,0), (0,1), (0,-1)])
         self.speed = 1
         self.alive = True
 
-    def can_move(self, x, y, tilemap):
-        for dx in (0, TILE-1):
-            for dy in (0, TILE-1):
-                if tilemap[(y+dy)//TILE][(x+dx)//TILE] == 1:
-                    return False
-        return True
-
-    def update(self, tilemap):
+    def update(self, exits, junctions, dist, frightened=False):
         if not self.alive:
             return
 
-        nx = self.x + self.dir_x * self.speed
-        ny = self.y + self.dir_y * self.speed
-
-        if self.can_move(nx, ny, tilemap):
-            self.x = nx
-            self.y = ny
-        else:
-            random.shuffle(DIRS := [(1,0), (-1,0), (0,1), (0,-1)])
-            for dx, dy in DIRS:
-                if self.can_move(self.x+dx, self.y+dy, tilemap):
-                    self.dir_x, self.dir_y = dx, dy
-                    break
+        # Decide only at tile centres of junctions (or when blocked);
+        # in between, the corridor ahead is known to be open
+        if self.x % TILE == 0 and self.y % TILE == 0:
+            i = (self.y//TILE) * WIDTH_TILES + self.x//TILE
+            if junctions[i] or not exits[i] & DIR_BITS[(self.dir_x, self.dir_y)]:
+                if not exits[i]:
+                    return
+                self.choose(i, exits[i], dist, frightened)
+
+        self.x += self.dir_x * self.speed
+        self.y += self.dir_y * self.speed
+
+    def choose(self, i, exits, dist, frightened):
+        """Math: take the exit whose tile is closest to the target on `dist`
+        (farthest when frightened), never reversing unless it's a dead end"""
+        options = EXIT_DIRS[exits]
+        if len(options) > 1:
+            options = [d for d in options if d != (-self.dir_x, -self.dir_y)]
+        key = lambda d: dist[i + d[0] + d[1]*WIDTH_TILES]
+        self.dir_x, self.dir_y = max(options, key=key) if frightened else min(options, key=key)
 
     def draw(self, frightened=False):
         if not self.alive:
@@ -54,27 +151,41 @@ class Ghost:
 # MAIN GAME
 # =====================
 class App:
-    def __init__(self):
+    def __init__(self, num_ghosts=NUM_GHOSTS, controls=None, profiler=None):
         pyxel.init(160, 120, title="Pac-Man Sprite Edition")
         pyxel.load("pacman.pyxres")
 
+        # Mazes and ghosts draw from one seeded RNG so sessions can be replayed
+        self.controls = controls or Controls(INPUT_KEYS)
+        self.rng = random.Random(self.controls.seed)
+
         self.score = 0
         self.lives = 3
+        self.timers = TimerWheel()
 
         self.powered = False
-        self.power_start = 0
+        self.power_timer = None
         self.power_duration = 5 * 30
 
         self.invincible = False
-        self.inv_start = 0
+        self.inv_duration = 60
+
+        # Ghosts start scattered, then alternate with chasing
+        self.chase = False
+        self.timers.schedule(SCATTER_TIME, self.switch_mode)
+
+        # Static wall layer, rebuilt by generate_maze only
+        self.wall_layer = pyxel.Tilemap(WIDTH_TILES, HEIGHT_TILES, 0)
+        # Dots painted once per maze, erased one at a time as they're eaten
+        self.dot_layer = pyxel.Image(WIDTH_TILES*TILE, HEIGHT_TILES*TILE)
 
         self.generate_maze()
         self.reset_player()
 
         # Spawn ghosts SAFELY
         self.ghosts = [
-            Ghost(*self.find_empty_tile()),
-            Ghost(*self.find_empty_tile())
+            Ghost(*self.find_empty_tile(), home=i % 4, rng=self.rng)
+            for i in range(num_ghosts)
         ]
 
         # =====================
@@ -90,17 +201,18 @@ class App:
         pyxel.musics[0].set([0, 0, 0, 0])
         pyxel.playm(0, loop=True)
 
-        pyxel.run(self.update, self.draw)
+        if profiler is not None:
+            profiler.attach(self, PROFILE_PHASES)
+        # Game time runs in fixed ticks, whatever the frame rate
+        self.loop = FixedStep(self.update, self.draw, self.controls.sample)
+        self.loop.run()
 
     # =====================
     # HELPERS
     # =====================
     def find_empty_tile(self):
-        while True:
-            x = random.randint(1, WIDTH_TILES-2)
-            y = random.randint(1, HEIGHT_TILES-2)
-            if self.tilemap[y][x] == 0:
-                return x*TILE, y*TILE
+        i = self.rng.choice(self.floor)
+        return i % WIDTH_TILES * TILE, i // WIDTH_TILES * TILE
 
     def reset_player(self):
         self.x = TILE
@@ -111,33 +223,107 @@ class App:
         self.next_dir_y = 0
 
     def generate_maze(self):
-        self.tilemap = []
+        """Randomized DFS maze over the odd tiles, then loops carved in.
+
+        Carving only removes walls, so the maze stays one connected region
+        and every dot can be reached from the start tile.
+        """
+        # Tilemap: one byte per tile (1 = wall), rows WIDTH_TILES apart
+        W = WIDTH_TILES
+        tilemap = bytearray([1]) * (W * HEIGHT_TILES)
+        tilemap[W + 1] = 0
+        stack = [(1, 1)]
+        while stack:
+            x, y = stack[-1]
+            options = [
+                (dx, dy)
+                for dx, dy in EXIT_DIRS[15]
+                if 0 < x + 2*dx < W-1 and 0 < y + 2*dy < HEIGHT_TILES-1
+                and tilemap[(y + 2*dy)*W + x + 2*dx] == 1
+            ]
+            if not options:
+                stack.pop()
+                continue
+            dx, dy = self.rng.choice(options)
+            tilemap[(y + dy)*W + x + dx] = 0
+            tilemap[(y + 2*dy)*W + x + 2*dx] = 0
+            stack.append((x + 2*dx, y + 2*dy))
+
+        # Knock out some walls between two corridors for Pac-Man style loops
+        for y in range(1, HEIGHT_TILES-1):
+            for x in range(1, W-1):
+                i = y*W + x
+                if tilemap[i] == 0 or self.rng.random() >= LOOP_PROB:
+                    continue
+                if (tilemap[i-1] == 0 and tilemap[i+1] == 0
+                        and tilemap[i-W] == 1 and tilemap[i+W] == 1) or \
+                   (tilemap[i-W] == 0 and tilemap[i+W] == 0
+                        and tilemap[i-1] == 1 and tilemap[i+1] == 1):
+                    tilemap[i] = 0
+        self.tilemap = tilemap
+
+        # Reachable floor (tile indices), found once: dots, spawns and the
+        # completion count
+        self.floor = array("I", [W + 1])
+        seen = Bitset(len(tilemap))
+        seen.add(W + 1)
+        for i in self.floor:
+            for _, step in EXIT_STEPS:
+                n = i + step
+                if n not in seen and tilemap[n] == 0:
+                    seen.add(n)
+                    self.floor.append(n)
+
+        # Every reachable tile starts with a dot: the flood fill's bitset
+        # becomes the dot set
+        self.dots = seen
+        self.dots_left = len(self.floor)
+
+        self.power_pellets = Bitset(len(tilemap))
+        self.power_list = self.rng.sample(list(self.floor), min(4, len(self.floor)))
+        for i in self.power_list:
+            self.power_pellets.add(i)
+
+        self.build_exits()
+        self.bake_walls()
+        self.bake_dots()
+
+    def build_exits(self):
+        """Math: exits bitmask of every tile (DIR_BITS of open neighbours)
+        and the junction table (tiles that aren't straight corridors)"""
+        self.exits = bytearray(WIDTH_TILES * HEIGHT_TILES)
+        self.junctions = bytearray(WIDTH_TILES * HEIGHT_TILES)
+        for i in self.floor:
+            mask = 0
+            for bit, step in EXIT_STEPS:
+                if self.tilemap[i + step] == 0:
+                    mask |= bit
+            self.exits[i] = mask
+            self.junctions[i] = mask not in CORRIDORS
+
+        self.distance_maps = DistanceMaps(self.exits)
+        # Scatter targets: the open tile nearest each corner
+        self.corners = []
+        for cx, cy in ((1, 1), (WIDTH_TILES-2, 1), (1, HEIGHT_TILES-2), (WIDTH_TILES-2, HEIGHT_TILES-2)):
+            self.corners.append(min(
+                self.floor,
+                key=lambda i: (abs(i % WIDTH_TILES - cx) + abs(i // WIDTH_TILES - cy), i)
+            ))
+
+    def bake_walls(self):
+        """Render the maze walls into the wall layer once"""
         for y in range(HEIGHT_TILES):
-            row = []
             for x in range(WIDTH_TILES):
-                if x == 0 or y == 0 or x == WIDTH_TILES-1 or y == HEIGHT_TILES-1:
-                    row.append(1)
-                else:
-                    row.append(1 if random.random() < WALL_PROB else 0)
-            self.tilemap.append(row)
-
-        self.tilemap[1][1] = 0
-
-        self.dots = {
-            (x*TILE+4, y*TILE+4)
-            for y in range(HEIGHT_TILES)
-            for x in range(WIDTH_TILES)
-            if self.tilemap[y][x] == 0
-        }
-
-        self.power_pellets = set(random.sample(list(self.dots), min(4, len(self.dots))))
+                tile = WALL_TILE if self.tilemap[y*WIDTH_TILES + x] == 1 else BLANK_TILE
+                self.wall_layer.pset(x, y, tile)
 
-    def can_move(self, x, y):
-        for dx in (0, TILE-1):
-            for dy in (0, TILE-1):
-                if self.tilemap[(y+dy)//TILE][(x+dx)//TILE] == 1:
-                    return False
-        return True
+    def bake_dots(self):
+        """Paint every dot into the dot layer (power pellets are drawn live)"""
+        self.dot_layer.cls(0)
+        for i in self.floor:
+            if i not in self.power_pellets:
+                x, y = i % WIDTH_TILES, i // WIDTH_TILES
+                self.dot_layer.circ(x*TILE+4, y*TILE+4, 1, 11)
 
     def centered(self):
         return self.x % TILE == 0 and self.y % TILE == 0
@@ -146,14 +332,44 @@ class App:
     # GAME LOGIC
     # =====================
     def eat(self):
-        pos = (self.x+4, self.y+4)
-        if pos in self.dots:
-            self.dots.remove(pos)
+        # Dots sit at tile centres
+        if not self.centered():
+            return
+        i = (self.y//TILE) * WIDTH_TILES + self.x//TILE
+        if i in self.dots:
+            self.dots.discard(i)
+            self.dot_layer.rect(self.x, self.y, TILE, TILE, 0)
+            self.dots_left -= 1
             self.score += 10
-        if pos in self.power_pellets:
-            self.power_pellets.remove(pos)
+        if i in self.power_pellets:
+            self.power_pellets.discard(i)
+            self.power_list.remove(i)
             self.powered = True
-            self.power_start = pyxel.frame_count
+            # Eating another pellet restarts the power-up
+            if self.power_timer is not None:
+                self.power_timer.cancel()
+            self.power_timer = self.timers.schedule(self.power_duration, self.end_power)
+        if self.dots_left == 0:
+            self.next_maze()
+
+    def next_maze(self):
+        """All dots eaten: new maze, everyone back on the board"""
+        self.generate_maze()
+        self.reset_player()
+        for g in self.ghosts:
+            g.x, g.y = self.find_empty_tile()
+            g.alive = True
+
+    def end_power(self):
+        self.powered = False
+        self.power_timer = None
+
+    def end_invincible(self):
+        self.invincible = False
+
+    def switch_mode(self):
+        self.chase = not self.chase
+        self.timers.schedule(CHASE_TIME if self.chase else SCATTER_TIME, self.switch_mode)
 
     def check_ghosts(self):
         for g in self.ghosts:
@@ -166,54 +382,64 @@ class App:
                 elif not self.invincible:
                     self.lives -= 1
                     self.invincible = True
-                    self.inv_start = pyxel.frame_count
+                    self.timers.schedule(self.inv_duration, self.end_invincible)
                     self.reset_player()
                     if self.lives <= 0:
+                        self.controls.close()
                         pyxel.quit()
 
     # =====================
     # UPDATE
     # =====================
     def update(self):
-        if pyxel.btn(pyxel.KEY_LEFT):  self.next_dir_x, self.next_dir_y = -1,0
-        if pyxel.btn(pyxel.KEY_RIGHT): self.next_dir_x, self.next_dir_y = 1,0
-        if pyxel.btn(pyxel.KEY_UP):    self.next_dir_x, self.next_dir_y = 0,-1
-        if pyxel.btn(pyxel.KEY_DOWN):  self.next_dir_x, self.next_dir_y = 0,1
-
-        if self.centered() and self.can_move(self.x+self.next_dir_x, self.y+self.next_dir_y):
-            self.dir_x, self.dir_y = self.next_dir_x, self.next_dir_y
-
-        if self.can_move(self.x+self.dir_x, self.y+self.dir_y):
+        # Fire power-up and invincibility expirations due this frame
+        self.timers.advance()
+
+        controls = self.controls
+        controls.poll()
+        if controls.btn(pyxel.KEY_LEFT):  self.next_dir_x, self.next_dir_y = -1,0
+        if controls.btn(pyxel.KEY_RIGHT): self.next_dir_x, self.next_dir_y = 1,0
+        if controls.btn(pyxel.KEY_UP):    self.next_dir_x, self.next_dir_y = 0,-1
+        if controls.btn(pyxel.KEY_DOWN):  self.next_dir_x, self.next_dir_y = 0,1
+
+        # Turn or stop only at tile centres; between them the way is open
+        moving = True
+        if self.centered():
+            exits = self.exits[(self.y//TILE) * WIDTH_TILES + self.x//TILE]
+            bit = DIR_BITS[(self.next_dir_x, self.next_dir_y)]
+            if exits & bit == bit:
+                self.dir_x, self.dir_y = self.next_dir_x, self.next_dir_y
+            bit = DIR_BITS[(self.dir_x, self.dir_y)]
+            moving = exits & bit == bit
+
+        if moving:
             self.x += self.dir_x
             self.y += self.dir_y
 
         self.eat()
-        for g in self.ghosts:
-            g.update(self.tilemap)
+        self.update_ghosts()
         self.check_ghosts()
 
-        if self.powered and pyxel.frame_count - self.power_start > self.power_duration:
-            self.powered = False
+    def update_ghosts(self):
+        # Chase (and frightened) ghosts share Pac-Man's distance map,
+        # scattering ghosts their corner's; all cached in distance_maps
+        pac = ((self.y+4)//TILE) * WIDTH_TILES + (self.x+4)//TILE
+        chase_map = self.distance_maps.get(pac)
+        scatter_maps = [self.distance_maps.get(c) for c in self.corners]
+        for g in self.ghosts:
+            dist = chase_map if self.chase or self.powered else scatter_maps[g.home]
+            g.update(self.exits, self.junctions, dist, self.powered)
 
-        if self.invincible and pyxel.frame_count - self.inv_start > 60:
-            self.invincible = False
+    def entity_counts(self):
+        """Live entities, for the profiler"""
+        return {"ghosts": sum(g.alive for g in self.ghosts), "dots": self.dots_left}
 
     # =====================
     # DRAW
     # =====================
     def draw(self):
         pyxel.cls(0)
-
-        for y in range(HEIGHT_TILES):
-            for x in range(WIDTH_TILES):
-                if self.tilemap[y][x] == 1:
-                    # Draw your wall sprite at 0,16 instead of rectangle
-                    pyxel.blt(x*TILE, y*TILE, 0, 0, 16, TILE, TILE, 0)
-
-        for d in self.dots:
-            pyxel.circ(d[0], d[1], 1, 11)
-        for p in self.power_pellets:
-            pyxel.circ(p[0], p[1], 2, 14)
+        self.draw_maze()
 
         pacman = {
             "right": (0, 8),
@@ -228,18 +454,36 @@ class App:
         elif self.dir_y > 0: direction = "down"
         else:               direction = "right"
 
-        mouth = (pyxel.frame_count // 5) % 2
+        mouth = (self.timers.now // 5) % 2
         u_closed, u_open = pacman[direction]
         u = u_open if mouth else u_closed
 
         pyxel.blt(self.x, self.y, 0, u, 0, 8, 8, 0)
 
-        for g in self.ghosts:
-            g.draw(self.powered)
+        self.draw_ghosts()
 
         pyxel.text(5, 5, f"SCORE {self.score}", 7)
         pyxel.text(5, 14, f"LIVES {self.lives}", 8)
 
+    def draw_maze(self):
+        # Walls were baked into the wall layer by generate_maze
+        pyxel.bltm(0, 0, self.wall_layer, 0, 0, WIDTH_TILES*TILE, HEIGHT_TILES*TILE, 0)
+
+        pyxel.blt(0, 0, self.dot_layer, 0, 0, WIDTH_TILES*TILE, HEIGHT_TILES*TILE, 0)
+
+        # Power pellets are the only per-frame overlay: they pulse
+        radius = 2 if (self.timers.now // 10) % 2 == 0 else 1
+        for i in self.power_list:
+            x, y = i % WIDTH_TILES, i // WIDTH_TILES
+            pyxel.circ(x*TILE+4, y*TILE+4, radius, 14)
+
+    def draw_ghosts(self):
+        for g in self.ghosts:
+            g.draw(self.powered)
+
 
 # =====================
-App()
+if __name__ == "__main__":
+    App(STRESS_GHOSTS if "--stress" in sys.argv else NUM_GHOSTS,
+        Controls.from_argv(sys.argv, INPUT_KEYS),
+        Profiler.from_argv(sys.argv))
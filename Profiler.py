@@ -0,0 +1,235 @@
+# =====================
+# FRAME PROFILER
+# =====================
+# Opt-in instrumentation for the games. attach() swaps the game's update,
+# draw and the methods named in its PROFILE_PHASES for timing wrappers on
+# that one instance, and the pyxel draw functions for counting ones, so a
+# game that isn't profiled runs exactly the code it always did.
+#
+# Every tick becomes one sample: perf_counter_ns spent in each phase
+# (phases can nest, e.g. wake_enemy runs inside update_enemies), the
+# game's entity_counts() and the draw calls made. Samples feed a log2
+# histogram per phase, a rolling average for the on-screen overlay (F1
+# toggles it, read once per pyxel frame through the game's Controls.sample)
+# and, optionally, a CSV or JSON Lines file:
+#
+#   python Dungeon.py --profile                 (overlay only)
+#   python Dungeon.py --profile frames.csv
+#   python Headless.py Pacman 5000 --profile frames.jsonl
+
+import atexit
+import json
+import time
+from collections import Counter, deque
+
+import pyxel
+
+DRAW_CALLS = ("cls", "camera", "pset", "line", "rect", "rectb", "circ", "circb",
+              "tri", "blt", "bltm", "text")
+HISTOGRAM_BUCKETS = 48   # Bucket k holds times of k bits: 2**(k-1) <= ns < 2**k
+OVERLAY_FRAMES = 30      # Ticks averaged by the overlay
+OVERLAY_KEY = pyxel.KEY_F1
+FLUSH_EVERY = 60         # Ticks between export flushes
+LINE_H = 6               # Overlay text line height
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        self.buckets[min(ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in ns"""
+        rank = p / 100 * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return 1 << k
+        return 0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ns": self.total // self.count if self.count else 0,
+            "p50_ns": self.percentile(50),
+            "p99_ns": self.percentile(99),
+            "max_ns": self.max,
+        }
+
+
+class Profiler:
+    def __init__(self, path=None, clock=time.perf_counter_ns):
+        self.path = path
+        self.clock = clock
+        self.game = None
+        self.phases = ()
+        self.histograms = {}
+        self.times = Counter()   # ns per phase this tick
+        self.calls = Counter()   # Draw calls this tick
+        self.recent = deque(maxlen=OVERLAY_FRAMES)
+        self.tick = 0
+        self.pending = False     # A tick ran and its sample isn't out yet
+        self.overlay = False
+        self.columns = None
+        self.out = None
+
+    @classmethod
+    def from_argv(cls, argv):
+        """A Profiler when the command line has --profile [FILE], else None"""
+        if "--profile" not in argv:
+            return None
+        i = argv.index("--profile") + 1
+        path = argv[i] if i < len(argv) and not argv[i].startswith("--") else None
+        return cls(path)
+
+    def attach(self, game, phases):
+        """Instrument `game`; call before its update/draw and controls.sample
+        are handed to FixedStep"""
+        self.game = game
+        self.phases = ("update", "draw") + tuple(phases)
+        self.histograms = {name: Histogram() for name in self.phases}
+        for name in phases:
+            setattr(game, name, self.timed(name, getattr(game, name)))
+        game.update = self.wrap_update(game.update)
+        game.draw = self.wrap_draw(game.draw)
+        game.controls.sample = self.wrap_sample(game.controls.sample)
+        for name in DRAW_CALLS:
+            if hasattr(pyxel, name):
+                # Re-attaching replaces an earlier profiler's counter
+                function = getattr(pyxel, name)
+                function = getattr(function, "__wrapped__", function)
+                setattr(pyxel, name, self.counted(name, function))
+        if self.path is not None:
+            self.out = open(self.path, "w")
+            atexit.register(self.close)
+
+    # =====================
+    # WRAPPERS
+    # =====================
+    def timed(self, name, method):
+        times, clock = self.times, self.clock
+
+        def timed_method(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times[name] += clock() - start
+        return timed_method
+
+    def counted(self, name, function):
+        calls = self.calls
+
+        def counted_call(*args, **kwargs):
+            calls[name] += 1
+            return function(*args, **kwargs)
+        counted_call.__wrapped__ = function
+        return counted_call
+
+    def wrap_update(self, update):
+        timed_update = self.timed("update", update)
+
+        def profiled_update():
+            if self.pending:
+                self.finish_tick()
+            timed_update()
+            self.pending = True
+        return profiled_update
+
+    def wrap_sample(self, sample):
+        # Runs every pyxel frame, even one with no tick (or no draw) in it
+        def profiled_sample():
+            if pyxel.btnp(OVERLAY_KEY):
+                self.overlay = not self.overlay
+            sample()
+        return profiled_sample
+
+    def wrap_draw(self, draw):
+        timed_draw = self.timed("draw", draw)
+
+        def profiled_draw():
+            timed_draw()
+            if self.overlay:
+                # Counted calls stop here, the overlay isn't the game's
+                calls = Counter(self.calls)
+                self.draw_overlay()
+                self.calls.clear()
+                self.calls.update(calls)
+        return profiled_draw
+
+    # =====================
+    # SAMPLES
+    # =====================
+    def finish_tick(self):
+        """Turn the tick just run into a sample"""
+        counts = self.game.entity_counts()
+        for name, ns in self.times.items():
+            self.histograms[name].add(ns)
+        sample = {"tick": self.tick}
+        sample.update((name, self.times[name]) for name in self.phases)
+        sample.update(counts)
+        sample.update((name, self.calls[name]) for name in DRAW_CALLS)
+        self.recent.append(sample)
+        if self.out is not None:
+            self.write(sample)
+        self.tick += 1
+        self.times.clear()
+        self.calls.clear()
+        self.pending = False
+
+    def write(self, sample):
+        if self.path.endswith(".csv"):
+            if self.columns is None:
+                self.columns = list(sample)
+                self.out.write(",".join(self.columns) + "\n")
+            self.out.write(",".join(str(sample.get(c, 0)) for c in self.columns) + "\n")
+        else:
+            self.out.write(json.dumps(sample) + "\n")
+        if self.tick % FLUSH_EVERY == 0:
+            self.out.flush()
+
+    def close(self):
+        """Write out the last tick and close the export file"""
+        if self.pending:
+            self.finish_tick()
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+
+    def summary(self):
+        """Histogram summary of every phase, in ns"""
+        return {name: h.summary() for name, h in self.histograms.items() if h.count}
+
+    # =====================
+    # OVERLAY
+    # =====================
+    def draw_overlay(self):
+        """Phase times (ms, averaged over the last ticks), entity counts and
+        draw calls, top left of the screen"""
+        n = len(self.recent)
+        if not n:
+            return
+        lines = []
+        for name in self.phases:
+            ms = sum(s[name] for s in self.recent) / n / 1e6
+            lines.append(f"{name[:16]:<16}{ms:6.2f}")
+        for name, count in self.game.entity_counts().items():
+            lines.append(f"{name[:16]:<16}{count:6}")
+        calls = sum(self.recent[-1][name] for name in DRAW_CALLS)
+        lines.append(f"{'draw calls':<16}{calls:6}")
+
+        lines = lines[:pyxel.height // LINE_H]
+        pyxel.camera()
+        pyxel.rect(0, 0, 4 * 22 + 2, len(lines) * LINE_H + 2, 0)
+        for i, line in enumerate(lines):
+            pyxel.text(1, 1 + i * LINE_H, line, 7)
@@ -0,0 +1,98 @@
+# =====================
+# TIMER WHEEL
+# =====================
+# Hierarchical timer wheel keyed by frame number. Scheduling and cancelling
+# are O(1) and advancing a frame only touches the timers that are due, so
+# thousands of sleeping timers cost nothing per frame.
+#
+# Level 0 has one slot per frame for the next WHEEL_SIZE frames, level 1 one
+# slot per WHEEL_SIZE frames, and so on. A higher level slot is cascaded down
+# when the lower levels wrap around to it.
+
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 4  # 64**4 frames, about 77 hours at 60 fps
+
+
+class Timer:
+    __slots__ = ("due", "period", "callback", "args", "active")
+
+    def __init__(self, due, period, callback, args):
+        self.due = due
+        self.period = period
+        self.callback = callback
+        self.args = args
+        self.active = True
+
+    def cancel(self):
+        self.active = False
+
+
+class TimerWheel:
+    def __init__(self, now=0):
+        self.now = now
+        self.levels = [[[] for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)]
+        self.overflow = []  # Timers further out than the wheel covers
+
+    def schedule(self, delay, callback, *args):
+        """Call callback(*args) `delay` frames from now (at least 1)"""
+        timer = Timer(self.now + max(1, delay), 0, callback, args)
+        self.insert(timer)
+        return timer
+
+    def at(self, frame, callback, *args):
+        """Call callback(*args) on frame `frame` (next frame if already past)"""
+        return self.schedule(frame - self.now, callback, *args)
+
+    def every(self, period, callback, *args):
+        """Call callback(*args) every `period` frames, starting `period` from now"""
+        timer = Timer(self.now + max(1, period), max(1, period), callback, args)
+        self.insert(timer)
+        return timer
+
+    def insert(self, timer):
+        delta = timer.due - self.now
+        for level in range(WHEEL_LEVELS):
+            if delta < 1 << (WHEEL_BITS * (level + 1)):
+                slot = (timer.due >> (WHEEL_BITS * level)) & WHEEL_MASK
+                self.levels[level][slot].append(timer)
+                return
+        self.overflow.append(timer)
+
+    def advance(self):
+        """Move to the next frame and fire every timer due on it"""
+        self.now += 1
+        now = self.now
+
+        # Cascade higher levels down when the levels below wrap around
+        for level in range(1, WHEEL_LEVELS):
+            if now & ((1 << (WHEEL_BITS * level)) - 1):
+                break
+            slot = (now >> (WHEEL_BITS * level)) & WHEEL_MASK
+            bucket = self.levels[level][slot]
+            self.levels[level][slot] = []
+            for timer in bucket:
+                if timer.active:
+                    self.insert(timer)
+        else:
+            if not now & ((1 << (WHEEL_BITS * WHEEL_LEVELS)) - 1):
+                overflow, self.overflow = self.overflow, []
+                for timer in overflow:
+                    if timer.active:
+                        self.insert(timer)
+
+        slot = now & WHEEL_MASK
+        bucket = self.levels[0][slot]
+        if not bucket:
+            return
+        self.levels[0][slot] = []
+        for timer in bucket:
+            if not timer.active:
+                continue
+            if timer.period:
+                timer.due += timer.period
+                self.insert(timer)
+            else:
+                timer.active = False
+            timer.callback(*timer.args)